@@ -0,0 +1,429 @@
+"""
+Cycles Trading Course - Report Archive Reader
+Shared helpers for walking reports/ and normalizing the hand-authored
+metadata.json / analysis.json files into flat rows.
+
+A report may live either as a folder or as a packed `<report>.bundle`
+(see bundle.py); every reader here falls back to the bundle when the folder
+is absent, so callers can keep using plain report_dir / "gold" / ... paths.
+"""
+
+import hashlib
+import json
+import os
+import re
+import socket
+import time
+from datetime import date
+from pathlib import Path
+
+import bundle
+
+REPORTS_DIR = Path(__file__).parent / "reports"
+
+# Asset folders in report order (matches download_report.map_images_to_assets)
+ASSETS = ["sp500", "bitcoin", "eurusd", "gold", "oil"]
+
+# Files whose content defines a report for export/fingerprinting purposes
+REPORT_JSON_FILES = ["metadata.json", "summary.json"]
+
+# Per-report record of every downloaded image: {"files": {"gold/33.png": {size, sha256}}}
+MANIFEST_NAME = "manifest.json"
+
+# Images that failed verification and must be fetched again on the next download
+REDOWNLOAD_QUEUE = REPORTS_DIR / "redownload.json"
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif"}
+
+# A lock whose holder is gone (dead pid) or silent this long is taken over
+STALE_LOCK_SECONDS = 15 * 60
+LOCK_POLL = 0.5
+
+DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+LEVEL_RE = re.compile(
+    r"^\s*\$?(\d[\d,]*(?:\.\d+)?)(?:\s*-\s*\$?(\d[\d,]*(?:\.\d+)?))?(?=\s*(?:$|\(|\+))"
+)
+
+
+_open_bundles = {}
+
+
+def open_bundle(report_dir):
+    """Return the Bundle standing in for a report folder that isn't on disk, or None."""
+    report_dir = Path(report_dir)
+    if report_dir.is_dir():
+        return None
+    path = bundle.bundle_path(report_dir)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _open_bundles.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    if cached:
+        cached[1].close()
+    opened = bundle.Bundle(path)
+    _open_bundles[path] = (mtime, opened)
+    return opened
+
+
+def locate_member(path):
+    """Find (bundle, member) for a path inside a packed report, or (None, None)."""
+    # Members sit at most two levels below the report: metadata.json, gold/33.png
+    for depth, report_dir in enumerate(Path(path).parents[:2], start=1):
+        b = open_bundle(report_dir)
+        if b is not None:
+            member = "/".join(Path(path).parts[-depth:])
+            return (b, member) if member in b else (None, None)
+    return None, None
+
+
+def path_exists(path):
+    """Like Path.exists(), but also true for members of a packed report."""
+    if Path(path).exists():
+        return True
+    return locate_member(path)[0] is not None
+
+
+def read_bytes(path):
+    """Read a file from disk or, if its report is packed, from the bundle."""
+    path = Path(path)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        b, member = locate_member(path)
+        if b is None:
+            raise
+        return b.read(member)
+
+
+def file_version(path):
+    """(mtime_ns, size) of a file, or of its bundle for packed reports; None if missing."""
+    try:
+        st = Path(path).stat()
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        b, member = locate_member(path)
+        if b is None:
+            return None
+        return b.path.stat().st_mtime_ns, b.size(member)
+
+
+def read_json(path):
+    """Read a JSON file, returning None if it does not exist."""
+    if not path_exists(path):
+        return None
+    return json.loads(read_bytes(path).decode("utf-8"))
+
+
+def report_id(report_dir, root=REPORTS_DIR):
+    """Return the archive-relative id of a report folder, e.g. '2026/03'."""
+    return Path(report_dir).relative_to(root).as_posix()
+
+
+def iter_reports(root=REPORTS_DIR):
+    """Yield every report folder (one containing metadata.json), oldest first."""
+    root = Path(root)
+    dirs = {meta.parent for meta in root.glob("*/*/metadata.json")}
+    for packed in root.glob(f"*/*{bundle.SUFFIX}"):
+        report_dir = packed.with_suffix("")
+        if report_dir not in dirs and path_exists(report_dir / "metadata.json"):
+            dirs.add(report_dir)
+    yield from sorted(dirs)
+
+
+def archive_signature(root=REPORTS_DIR):
+    """Cheap change signature: mtimes of every analysis.json and bundle."""
+    root = Path(root)
+    paths = list(root.glob("*/*/*/analysis.json")) + list(root.glob(f"*/*{bundle.SUFFIX}"))
+    return {str(p): p.stat().st_mtime_ns for p in paths}
+
+
+def report_assets(report_dir):
+    """Return the asset keys that have an analysis.json in this report."""
+    report_dir = Path(report_dir)
+    return [a for a in ASSETS if path_exists(report_dir / a / "analysis.json")]
+
+
+def load_analysis(report_dir, asset):
+    """Load one asset's analysis.json, or None if it was never authored."""
+    return read_json(Path(report_dir) / asset / "analysis.json")
+
+
+def iter_images(report_dir):
+    """Yield every downloaded slide image in a report folder."""
+    report_dir = Path(report_dir)
+    b = open_bundle(report_dir)
+    paths = [report_dir / n for n in b.names() if n.count("/") == 1] if b else report_dir.glob("*/*")
+    for path in sorted(paths):
+        if path.suffix.lower() in IMAGE_EXTENSIONS:
+            yield path
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_manifest(report_dir):
+    """Return the report's manifest {"files": {...}}, empty if none was written yet."""
+    return read_json(Path(report_dir) / MANIFEST_NAME) or {"files": {}}
+
+
+def write_manifest(report_dir, manifest):
+    manifest["files"] = dict(sorted(manifest["files"].items()))
+    write_json(Path(report_dir) / MANIFEST_NAME, manifest)
+
+
+def load_redownload_queue(path=REDOWNLOAD_QUEUE):
+    """Return queued entries as [{report, file, reasons}]."""
+    return read_json(path) or []
+
+
+def save_redownload_queue(entries, path=REDOWNLOAD_QUEUE):
+    write_json(path, entries)
+
+
+def atomic_write(path, data):
+    """
+    Write bytes via a temp file in the same folder and rename it into place,
+    so readers (and a crash) only ever see the old file or the complete new one.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def write_json(path, obj):
+    atomic_write(path, json.dumps(obj, indent=2, ensure_ascii=False).encode())
+
+
+class LockTimeout(Exception):
+    pass
+
+
+class FileLock:
+    """
+    Cross-process lock held as an O_EXCL lock file containing {pid, host, time}.
+
+    A lock is stale when its holder's pid no longer exists on this host, or
+    nobody has refreshed it for `stale_after` seconds; stale locks are
+    renamed aside (so only one waiter wins) and taken over.
+    """
+
+    def __init__(self, path, timeout=0, stale_after=STALE_LOCK_SECONDS):
+        self.path = Path(path)
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.held = False
+
+    def _owner(self):
+        """(raw lock file bytes, mtime), or (None, None) if there is no lock."""
+        try:
+            return self.path.read_bytes(), self.path.stat().st_mtime
+        except FileNotFoundError:
+            return None, None
+
+    def _is_stale(self, raw, mtime):
+        if time.time() - mtime > self.stale_after:
+            return True
+        try:
+            owner = json.loads(raw)
+        except ValueError:
+            return False  # holder is still writing it
+        if owner.get("host") == socket.gethostname():
+            try:
+                os.kill(owner["pid"], 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+        return False
+
+    def _break(self, raw):
+        """Move a stale lock aside; put it back if it changed hands meanwhile."""
+        aside = self.path.with_name(f"{self.path.name}.stale.{os.getpid()}")
+        try:
+            os.rename(self.path, aside)
+        except FileNotFoundError:
+            return
+        if aside.read_bytes() != raw:
+            try:
+                os.link(aside, self.path)
+            except FileExistsError:
+                pass
+        else:
+            print(f"Removed stale lock {self.path.name}")
+        aside.unlink()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        info = json.dumps({"pid": os.getpid(), "host": socket.gethostname(),
+                           "time": time.time()}).encode()
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                raw, mtime = self._owner()
+                if raw is None:
+                    continue
+                if self._is_stale(raw, mtime):
+                    self._break(raw)
+                    continue
+                if time.monotonic() >= deadline:
+                    raise LockTimeout(f"{self.path} is held by {raw.decode(errors='replace')}")
+                time.sleep(LOCK_POLL)
+                continue
+            with os.fdopen(fd, "wb") as f:
+                f.write(info)
+            self.held = True
+            return self
+
+    def refresh(self):
+        """Heartbeat for long holders so the lock doesn't look stale."""
+        if self.held:
+            os.utime(self.path)
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def report_lock(report_dir, timeout=0):
+    """Lock for one report, kept beside the folder (reports/2026/03.lock) so it isn't packed."""
+    report_dir = Path(report_dir)
+    report_dir.parent.mkdir(parents=True, exist_ok=True)
+    return FileLock(report_dir.parent / (report_dir.name + ".lock"), timeout=timeout)
+
+
+def queue_lock(path=REDOWNLOAD_QUEUE, timeout=30):
+    path = Path(path)
+    return FileLock(path.with_name(path.name + ".lock"), timeout=timeout)
+
+
+def content_hash(report_dir):
+    """SHA-256 over the report's JSON files, stable across machines."""
+    report_dir = Path(report_dir)
+    paths = [report_dir / name for name in REPORT_JSON_FILES]
+    paths += [report_dir / a / "analysis.json" for a in ASSETS]
+
+    h = hashlib.sha256()
+    for path in paths:
+        if path_exists(path):
+            h.update(path.relative_to(report_dir).as_posix().encode())
+            h.update(b"\0")
+            h.update(read_bytes(path))
+            h.update(b"\0")
+    return h.hexdigest()
+
+
+def parse_date_span(value):
+    """
+    Parse '2026-03-13' or '2026-02-17 to 2026-02-18' into (start, end) dates.
+    Returns (None, None) when no ISO date is present.
+    """
+    found = DATE_RE.findall(value or "")
+    if not found:
+        return None, None
+    start = date.fromisoformat(found[0])
+    end = date.fromisoformat(found[-1])
+    return start, max(start, end)
+
+
+def parse_probability(value):
+    """Parse '76%' / '~60%' into 0.76 / 0.60, or None."""
+    if not value:
+        return None
+    m = re.search(r"(\d+(?:\.\d+)?)\s*%", str(value))
+    return float(m.group(1)) / 100 if m else None
+
+
+def parse_direction(value):
+    """Normalize 'up'/'Up'/'U' and 'down'/'Down'/'D' to 'up'/'down', else None."""
+    value = (value or "").strip().lower()
+    if value.startswith("u"):
+        return "up"
+    if value.startswith("d"):
+        return "down"
+    return None
+
+
+def parse_level(value):
+    """
+    Parse a support/resistance level such as '$4,548 - $4,638' or '3160+'
+    into (low, high) floats. Descriptive levels ('ATH zone') return (None, None).
+    """
+    m = LEVEL_RE.match(value or "")
+    if not m:
+        return None, None
+    low = float(m.group(1).replace(",", ""))
+    high = float(m.group(2).replace(",", "")) if m.group(2) else low
+    return min(low, high), max(low, high)
+
+
+def key_dates(analysis):
+    """Return the analysis key dates as [{start, end, description}]."""
+    rows = []
+    for item in (analysis or {}).get("key_dates", []):
+        start, end = parse_date_span(item.get("date"))
+        if start is None:
+            continue
+        rows.append({"start": start, "end": end, "description": item.get("description", "")})
+    return rows
+
+
+def statistics(analysis):
+    """
+    Return dated statistics as [{start, end, probability, direction, description}].
+    Handles the 'date', 'date'+'end_date' and 'date_range' spellings; undated
+    seasonal notes are skipped.
+    """
+    rows = []
+    for item in (analysis or {}).get("statistics", []):
+        span = item.get("date_range") or item.get("date")
+        if item.get("end_date"):
+            span = f"{span} to {item['end_date']}"
+        start, end = parse_date_span(span)
+        if start is None:
+            continue
+        rows.append({
+            "start": start,
+            "end": end,
+            "probability": parse_probability(item.get("probability")),
+            "direction": parse_direction(item.get("direction")),
+            "description": item.get("description") or item.get("detail", ""),
+        })
+    return rows
+
+
+def levels(analysis):
+    """Return support/resistance as [{kind, level, low, high, description}]."""
+    rows = []
+    technical = (analysis or {}).get("technical", {})
+    for kind in ("support", "resistance"):
+        for item in technical.get(kind, []):
+            if isinstance(item, dict):
+                text, description = str(item.get("level", "")), item.get("description", "")
+            else:
+                # Some months list levels as plain strings: "$51.18 (visible on weekly chart)"
+                text, _, description = str(item).partition(" (")
+                description = description.rstrip(")")
+            low, high = parse_level(text)
+            rows.append({"kind": kind, "level": text.strip(), "low": low, "high": high,
+                         "description": description})
+    return rows
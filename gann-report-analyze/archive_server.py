@@ -0,0 +1,325 @@
+"""
+Cycles Trading Course - Local Archive Server
+Small HTTP server for browsing reports/ from GannForce or a browser.
+
+  GET /api/reports                      years in the archive
+  GET /api/reports/<year>               reports in a year
+  GET /api/reports/<year>/<month>       one report: metadata + files by asset
+  GET /api/reports/<year>/<month>/<asset>
+  GET /files/<year>/<month>/<path>      raw file (slides, analysis.json, ...)
+
+Every response carries a strong ETag (content SHA-256, suffixed -gz for the
+gzip coding) so repeat loads are 304s; files support single byte ranges; JSON
+is served pre-gzipped; recently used files stay in an LRU cache bounded by
+--cache-mb (the /api listings are kept outside it). Packed bundles are
+served through archive.read_bytes like folders.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+import archive
+import bundle
+
+PORT = 8765
+CACHE_MB = 64
+RESCAN_INTERVAL = 10.0
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+mimetypes.add_type("image/webp", ".webp")
+
+
+def sniff_type(path, data):
+    """Slides are often webp saved as .png; trust the bytes over the suffix."""
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+
+
+def accepts_gzip(header):
+    """True if an Accept-Encoding header allows gzip ("gzip;q=0" refuses it)."""
+    weights = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
+
+
+class Entry:
+    """A cached response body with its validators and optional gzip variant."""
+
+    __slots__ = ("body", "gz", "etag", "gz_etag", "ctype", "version")
+
+    def __init__(self, body, ctype, version, compress=False):
+        self.body = body
+        self.ctype = ctype
+        self.version = version
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.gz = gzip.compress(body, compresslevel=9, mtime=0) if compress else None
+        # Strong validators must differ between content-codings
+        self.gz_etag = self.etag[:-1] + '-gz"' if compress else None
+
+    @property
+    def size(self):
+        return len(self.body) + (len(self.gz) if self.gz else 0)
+
+
+class FileCache:
+    """LRU of file entries bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def get(self, path, version):
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or entry.version != version:
+                return None
+            self.entries.move_to_end(path)
+            return entry
+
+    def put(self, path, entry):
+        with self.lock:
+            old = self.entries.pop(path, None)
+            if old:
+                self.used -= old.size
+            if entry.size > self.max_bytes:
+                return
+            self.entries[path] = entry
+            self.used += entry.size
+            while self.used > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.used -= evicted.size
+
+
+def report_files(report_dir):
+    """All member paths of a report relative to its folder, from disk or bundle."""
+    b = archive.open_bundle(report_dir)
+    if b:
+        return sorted(b.names())
+    return sorted(p.relative_to(report_dir).as_posix() for p in report_dir.rglob("*") if p.is_file())
+
+
+def build_listings(root=archive.REPORTS_DIR):
+    """Precompute every /api/reports listing as {url_path: python object}."""
+    listings = {}
+    years = {}
+    for report_dir in archive.iter_reports(root):
+        rid = archive.report_id(report_dir, root)
+        year = rid.partition("/")[0]
+        meta = archive.read_json(report_dir / "metadata.json") or {}
+        files = report_files(report_dir)
+
+        by_asset = {}
+        for name in files:
+            folder = name.rpartition("/")[0]
+            by_asset.setdefault(folder, []).append(f"/files/{rid}/{name}")
+
+        summary = {"id": rid, "title": meta.get("title"), "images": meta.get("images"),
+                   "sections": meta.get("sections", {}), "assets": archive.report_assets(report_dir),
+                   "packed": archive.open_bundle(report_dir) is not None,
+                   "url": f"/api/reports/{rid}"}
+        years.setdefault(year, []).append(summary)
+
+        listings[f"/api/reports/{rid}"] = {**summary, "metadata": meta, "files": by_asset}
+        for asset, urls in by_asset.items():
+            if not asset:
+                continue
+            listings[f"/api/reports/{rid}/{asset}"] = {
+                "id": rid, "asset": asset, "files": urls,
+                "analysis": f"/files/{rid}/{asset}/analysis.json"
+                if f"{asset}/analysis.json" in files else None,
+            }
+
+    for year, reports in years.items():
+        listings[f"/api/reports/{year}"] = {"year": year, "reports": reports}
+    listings["/api/reports"] = {"years": [{"year": y, "reports": len(r), "url": f"/api/reports/{y}"}
+                                          for y, r in sorted(years.items())]}
+    return listings
+
+
+class Archive:
+    """Shared state: listings, file cache and change detection."""
+
+    def __init__(self, root=archive.REPORTS_DIR, cache_mb=CACHE_MB):
+        self.root = Path(root)
+        self.cache = FileCache(cache_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.checked = float("-inf")
+        self.signature = None
+        self.listings = {}
+        self.refresh()
+
+    def refresh(self):
+        """Rebuild listings (and pre-gzip JSON) if the archive changed; at most every RESCAN_INTERVAL."""
+        now = time.monotonic()
+        if now - self.checked < RESCAN_INTERVAL:
+            return
+        with self.lock:
+            if now - self.checked < RESCAN_INTERVAL:
+                return
+            self.checked = now
+            # Folder mtimes catch slides added or removed; file versions are checked per request
+            dirs = {str(p): p.stat().st_mtime_ns
+                    for pattern in ("*/*", "*/*/*") for p in self.root.glob(pattern) if p.is_dir()}
+            signature = (archive.archive_signature(self.root), dirs)
+            if signature == self.signature:
+                return
+            self.listings = {path: Entry(json.dumps(obj, ensure_ascii=False).encode(),
+                                         "application/json; charset=utf-8", None, compress=True)
+                             for path, obj in build_listings(self.root).items()}
+            for report_dir in archive.iter_reports(self.root):
+                for name in ["metadata.json", "summary.json"] + [
+                        f"{a}/analysis.json" for a in archive.report_assets(report_dir)]:
+                    self.load(report_dir / name)
+            self.signature = signature
+
+    def resolve(self, rel):
+        """Map /files/<rel> to a path under the archive root, refusing traversal."""
+        parts = [p for p in rel.split("/") if p]
+        if not parts or any(p in (".", "..") or p.endswith(bundle.SUFFIX) for p in parts):
+            return None
+        return self.root.joinpath(*parts)
+
+    def load(self, path):
+        """Return the cached Entry for a file, reading it on a miss; None if missing or not a file."""
+        version = archive.file_version(path)
+        if version is None:
+            return None
+        key = str(path)
+        entry = self.cache.get(key, version)
+        if entry is None:
+            try:
+                data = archive.read_bytes(path)
+            except OSError:
+                # A report folder, or a file that vanished since the stat
+                return None
+            is_json = path.suffix == ".json"
+            entry = Entry(data, "application/json; charset=utf-8" if is_json else sniff_type(path, data),
+                          version, compress=is_json)
+            self.cache.put(key, entry)
+        return entry
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "GannArchive/1.0"
+    protocol_version = "HTTP/1.1"
+    archive = None  # set by run()
+
+    def log_message(self, fmt, *args):
+        if not self.server.quiet:
+            super().log_message(fmt, *args)
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        self.archive.refresh()
+        path = unquote(urlsplit(self.path).path).rstrip("/") or "/"
+
+        if path.startswith("/api/reports"):
+            entry = self.archive.listings.get(path)
+            cache_control = "no-cache"
+        elif path.startswith("/files/"):
+            target = self.archive.resolve(path[len("/files/"):])
+            entry = self.archive.load(target) if target else None
+            cache_control = "public, max-age=300"
+        else:
+            entry = None
+
+        if entry is None:
+            return self.send_body(404, b'{"error":"not found"}', "application/json", head=head)
+
+        gzipped = entry.gz is not None and accepts_gzip(self.headers.get("Accept-Encoding"))
+        etag = entry.gz_etag if gzipped else entry.etag
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Accept-Ranges": "bytes",
+                   "Vary": "Accept-Encoding"}
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            return self.send_body(304, b"", None, headers, head=True)
+
+        range_header = self.headers.get("Range")
+        if range_header and entry.gz is None:
+            if_range = self.headers.get("If-Range")
+            if not if_range or if_range == entry.etag:
+                return self.send_range(entry, range_header, headers, head)
+
+        body = entry.body
+        if gzipped:
+            body = entry.gz
+            headers["Content-Encoding"] = "gzip"
+        self.send_body(200, body, entry.ctype, headers, head=head)
+
+    def send_range(self, entry, range_header, headers, head):
+        size = len(entry.body)
+        m = RANGE_RE.match(range_header.strip())
+        if not m or (not m.group(1) and not m.group(2)):
+            return self.send_body(200, entry.body, entry.ctype, headers, head=head)
+        if m.group(1):
+            start = int(m.group(1))
+            end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+        else:
+            start, end = max(0, size - int(m.group(2))), size - 1
+        if start >= size or start > end:
+            headers["Content-Range"] = f"bytes */{size}"
+            return self.send_body(416, b"", None, headers, head=True)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        self.send_body(206, entry.body[start:end + 1], entry.ctype, headers, head=head)
+
+    def send_body(self, status, body, ctype, headers=None, head=False):
+        self.send_response(status)
+        if ctype:
+            self.send_header("Content-Type", ctype)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Content-Length", "0" if status == 304 else str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+def run(host="127.0.0.1", port=PORT, cache_mb=CACHE_MB, quiet=False):
+    Handler.archive = Archive(cache_mb=cache_mb)
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.quiet = quiet
+    server.daemon_threads = True
+    print(f"Serving {Handler.archive.root} on http://{host}:{port}/api/reports "
+          f"({len(Handler.archive.listings)} listings, cache {cache_mb}MB)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the reports/ archive over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-mb", type=int, default=CACHE_MB, help="Hot-file cache size")
+    parser.add_argument("--quiet", action="store_true", help="Don't log each request")
+    args = parser.parse_args()
+
+    run(args.host, args.port, args.cache_mb, args.quiet)
@@ -0,0 +1,416 @@
+"""
+Cycles Trading Course - Incremental Report Build
+Rebuilds the files derived from each downloaded report, and only the ones
+whose inputs changed:
+
+  <asset>/*.png        slides (written by download_report.py)
+    -> metadata.json   "sections" recounted from the slide folders
+    -> <asset>/analysis.json   authored; flagged stale if its slides changed
+       -> summary.json authored; flagged stale if an analysis.json changed
+       -> dates.txt    key dates and statistics per asset (authored for
+                       special reports, whose windows are editorial)
+  every dates.txt -> reports/dates.txt (all-dates union plus each month)
+
+Every node records a fingerprint of its inputs' content hashes and the hash
+of its output in build_state.json. A node re-runs only when the fingerprint
+moved (or its output changed underneath it), reports are built in parallel,
+and file hashes are cached by (mtime, size) so a rebuild with nothing
+changed reads no slides and writes nothing.
+
+Existing outputs are adopted as-is on the first build. A derived file that
+was edited by hand after the build wrote it is not overwritten without --force.
+"""
+
+import calendar
+import hashlib
+import json
+import os
+import re
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+
+import archive
+
+HERE = Path(__file__).parent
+STATE_FILE = HERE / "build_state.json"
+DATES_NAME = "dates.txt"
+LOCK_TIMEOUT = 10 * 60
+
+ASSET_LABELS = {"sp500": "S&P500", "bitcoin": "Bitcoin", "eurusd": "EUR/USD", "gold": "Gold", "oil": "Oil"}
+SECTION_ORDER = ["cover"] + archive.ASSETS + ["review"]
+
+# Dates in statistic prose: "March 30", "Aug 9", "Sept 2" or "28.07"
+MONTH_NUMBERS = {m.lower(): i for names in (calendar.month_name, calendar.month_abbr)
+                 for i, m in enumerate(names) if m}
+MONTH_NUMBERS["sept"] = 9
+DAY_RE = re.compile(r"\b(?:([A-Za-z]+)\.? (\d{1,2})|(\d{1,2})\.(\d{1,2}))\b")
+# "closed higher on March 30 than on March 13": a range, not a point
+COMPARE_RE = re.compile(r"\b(higher|lower)\b.*\b(than|compared|vs)\b", re.I | re.S)
+# "Bitcoin ended November positively": the whole month, not its date
+MONTH_CLOSE_RE = re.compile(r"\bended (?:" + "|".join(calendar.month_name[1:]) + r")\b")
+DIRECTION_WORDS = [(re.compile(r"\b(up|upward|rise|rose|higher|bullish|buyers)\b", re.I), "up"),
+                   (re.compile(r"\b(down|downward|decline|declined|lower|bearish|sellers)\b", re.I), "down")]
+SUFFIX = {"up": ".U", "down": ".D"}
+# How a statistic names its asset; one naming another asset is a cross-reference
+ASSET_WORDS = {"sp500": r"index|s&p", "bitcoin": r"bitcoin", "eurusd": r"euro|eur/usd",
+               "gold": r"gold", "oil": r"oil"}
+ASSET_RE = re.compile(r"\b(" + "|".join(ASSET_WORDS.values()) + r")\b", re.I)
+
+
+def fingerprint(parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class Hasher:
+    """SHA-256 of files, cached by (mtime_ns, size) so unchanged files are never re-read."""
+
+    def __init__(self, root, cache):
+        self.root = Path(root)
+        self.cache = cache
+
+    def __call__(self, path):
+        version = archive.file_version(path)
+        if version is None:
+            return None
+        key = Path(path).relative_to(self.root).as_posix()
+        cached = self.cache.get(key)
+        if cached and cached[:2] == list(version):
+            return cached[2]
+        digest = archive.sha256_bytes(archive.read_bytes(path))
+        self.cache[key] = [*version, digest]
+        return digest
+
+
+def period(report_dir):
+    """'March 2026' for 2026/03 (and 2026/03-special), '2026 Annual Forecast' otherwise."""
+    month = report_dir.name.split("-")[0]
+    if month.isdigit():
+        return f"{calendar.month_name[int(month)]} {report_dir.parent.name}"
+    return f"{report_dir.parent.name} {report_dir.name.replace('-', ' ').title()}"
+
+
+def day(d):
+    return d.strftime("%d.%m.%y")
+
+
+def prose_dates(text, near):
+    """The dates named in a statistic's prose, each in the year closest to `near`."""
+    found = []
+    for m in DAY_RE.finditer(text):
+        month = MONTH_NUMBERS.get(m.group(1).lower()) if m.group(1) else int(m.group(4))
+        try:
+            candidates = [date(near.year + k, month, int(m.group(2) or m.group(3))) for k in (-1, 0, 1)]
+        except (TypeError, ValueError):
+            continue
+        found.append(min(candidates, key=lambda d: abs(d - near)))
+    return found
+
+
+def direction(*texts):
+    """'up'/'down' from a direction field or, failing that, the wording."""
+    for text in texts:
+        for pattern, value in DIRECTION_WORDS:
+            if pattern.search(text):
+                return value
+    return None
+
+
+def subject(text):
+    """The asset a statistic's prose is about, when it names one."""
+    m = ASSET_RE.search(text)
+    if not m:
+        return None
+    return next(a for a, words in ASSET_WORDS.items() if re.fullmatch(words, m.group(1), re.I))
+
+
+def statistic_lines(report_dir, asset, analysis):
+    """
+    The statistics lines of one asset: seasonal points "13.03.26.U", then one
+    line per range "13.03.26-30.03.26.U". A range comes from a statistic that
+    compares two closes; its direction is whether the later close is higher.
+    When such a statistic has no direction field of its own, its closing date
+    is listed as a point as well, unless it carries a plain up/down field.
+    """
+    month = report_dir.name.split("-")[0]
+    near = date(int(report_dir.parent.name), int(month) if month.isdigit() else 7, 15)
+    items = (analysis or {}).get("statistics", [])
+    texts = [item.get("description") or item.get("detail") or "" for item in items]
+    points, ranges = [], []
+    for item, text in zip(items, texts):
+        span = item.get("date_range") or item.get("date")
+        if item.get("end_date"):
+            span = f"{span} to {item['end_date']}"
+        start, end = archive.parse_date_span(span)
+        named = sorted(set(prose_dates(text, start or near)))
+        if subject(text) not in (None, asset) or MONTH_CLOSE_RE.search(text) or (
+                texts.count(text) > 1 and len(named) > 1):
+            # Another asset's figure, a whole-month figure, or one note filed under each of its dates
+            continue
+        field = str(item.get("direction") or "")
+        compared = COMPARE_RE.search(text)
+        if compared and len(named) == 2:
+            close, reference = prose_dates(text, start or near)[:2]
+            rising = (compared.group(1).lower() == "higher") == (close > reference)
+            ranges.append(f"{day(named[0])}-{day(named[1])}" + SUFFIX["up" if rising else "down"])
+            if field.lower() in ("up", "down"):
+                continue
+            if start is None or start != end:
+                start = close
+        elif start is None or start != end:
+            # Undated, or a window with no comparison behind it
+            continue
+        points.append((start, day(start) + SUFFIX.get(direction(field, text), "")))
+    points.sort(key=lambda p: p[0])
+    lines = ["statistics: " + ", ".join(token for _, token in points)] if points else []
+    return lines + ["statistics: " + r for r in ranges]
+
+
+def render_dates(report_dir):
+    """The report's dates.txt, generated from its analysis.json files; None if none were authored."""
+    blocks = []
+    for asset in archive.report_assets(report_dir):
+        analysis = archive.load_analysis(report_dir, asset)
+        lines = [ASSET_LABELS[asset]]
+        dates = []
+        for row in archive.key_dates(analysis):
+            # A two-day key date ("2026-02-17 to 2026-02-18") is listed day by day
+            days = range(row["start"].toordinal(), row["end"].toordinal() + 1)
+            dates += [day(date.fromordinal(n)) for n in days]
+        if dates:
+            lines.append("key_dates: " + ", ".join(dates))
+        lines += statistic_lines(report_dir, asset, analysis)
+        blocks.append("\n".join(lines))
+    if not blocks:
+        return None
+    return f"{period(report_dir)} - Key Dates by Asset\n\n" + "\n\n".join(blocks) + "\n"
+
+
+def parse_dates(text):
+    """(period, {asset label: [(line key, kind, tokens)]}) from a dates.txt."""
+    lines = text.strip("\n").split("\n")
+    title = lines[0].split(" - ")[0]
+    assets, current = {}, None
+    for line in lines[1:]:
+        key, sep, value = line.partition(":")
+        if not line.strip():
+            continue
+        if sep and key in ("key_dates", "statistics"):
+            tokens = [t.strip() for t in value.split(",") if t.strip()]
+            kind = key if key == "key_dates" else ("ranges" if tokens and "-" in tokens[0] else "points")
+            assets[current].append((key, kind, tokens))
+        else:
+            current = line.strip()
+            assets[current] = []
+    return title, assets
+
+
+def merge_dates(sections):
+    """reports/dates.txt: every date per asset across the archive, then each report's own."""
+    def order(token):
+        return datetime.strptime(token[:8], "%d.%m.%y"), token
+
+    union, months = {}, []
+    for title, assets in sections:
+        lines = [f"{title} - Key Dates by Asset", ""]
+        for label, rows in assets.items():
+            lines.append(label)
+            for key, kind, tokens in rows:
+                lines.append(f"{key}: " + ",".join(tokens))
+                union.setdefault(label, {}).setdefault(kind, []).extend(tokens)
+            lines.append("")
+        months.append("\n".join(lines))
+
+    lines = [f"All Dates by Asset ({sections[0][0]} - {sections[-1][0]})", ""]
+    for label, kinds in union.items():
+        lines.append(label)
+        for kind in ("key_dates", "points", "ranges"):
+            if kind in kinds:
+                key = "key_dates" if kind == "key_dates" else "statistics"
+                lines.append(f"{key}: " + ",".join(sorted(set(kinds[kind]), key=order)))
+        lines.append("")
+    return "\n".join(lines) + "\n===\n\n" + "\n---\n\n".join(months)
+
+
+def render_metadata(report_dir):
+    """metadata.json with "sections" recounted from the slides on disk."""
+    meta = archive.read_json(report_dir / "metadata.json") or {}
+    counts = {}
+    for path in archive.iter_images(report_dir):
+        counts[path.parent.name] = counts.get(path.parent.name, 0) + 1
+    names = [s for s in SECTION_ORDER if s in counts] + sorted(set(counts) - set(SECTION_ORDER))
+    meta["sections"] = {s: counts[s] for s in names}
+    return json.dumps(meta, indent=2, ensure_ascii=False).encode()
+
+
+def encode(data):
+    return data.encode() if isinstance(data, str) else data
+
+
+def run_node(name, kind, inputs, path, make, state, hasher, force=False, dry_run=False):
+    """
+    Bring one node up to date. Kinds:
+      authored   written by hand; only checked against its inputs
+      generated  written by the build; existing files are adopted, hand edits kept
+      merged     the build updates part of a file others write too (metadata.json)
+    Returns what happened: "fresh", "adopted", "diverged" (adopted, but not what
+    the build would write), "built", "kept" (hand edit recorded), "conflict"
+    (hand edit vs. changed inputs), "stale" (authored file older than its
+    inputs), "packed" or None (no output).
+    """
+    current = hasher(path)
+    old = state.get(name)
+    if kind == "authored":
+        if current is None:
+            state.pop(name, None)
+            return None
+        if old is None or old["output"] != current:
+            # Written (or rewritten) by hand: it now reflects the current inputs
+            state[name] = {"inputs": inputs, "output": current}
+            return "adopted" if old is None else "fresh"
+        return "stale" if old["inputs"] != inputs else "fresh"
+
+    if not force:
+        if old is None and current is not None:
+            state[name] = {"inputs": inputs, "output": current}
+            generated = encode(make()) if kind == "generated" else None
+            if kind == "generated" and (generated is None or archive.sha256_bytes(generated) != current):
+                # Curated by hand before the build existed: protect it like an edit
+                state[name]["edited"] = True
+                return "diverged"
+            return "adopted"
+        if old and old["inputs"] == inputs and old["output"] == current:
+            return "fresh"
+        if old and current is not None and kind != "merged" and (current != old["output"] or old.get("edited")):
+            if old["inputs"] == inputs:
+                state[name] = {"inputs": inputs, "output": current, "edited": True}
+                return "kept"
+            return "conflict"
+
+    data = encode(make())
+    if data is None:
+        return None
+    if current is not None and archive.sha256_bytes(data) == current:
+        state[name] = {"inputs": inputs, "output": current}
+        return "fresh"
+    if dry_run:
+        return "built"
+    if not path.parent.exists() and archive.open_bundle(path.parent) is not None:
+        # Packed reports are frozen; unpack one to rebuild it
+        return "packed"
+    archive.atomic_write(path, data)
+    state[name] = {"inputs": inputs, "output": hasher(path)}
+    return "built"
+
+
+def build_report(report_dir, state, hasher, force=False, dry_run=False):
+    """Run a report's nodes in dependency order. Returns {node: result} for anything not fresh."""
+    slides = {}
+    analyses = {a: report_dir / a / "analysis.json" for a in archive.ASSETS}
+
+    def analysis_hashes():
+        return fingerprint({a: hasher(p) for a, p in analyses.items()})
+
+    # node: (kind, inputs fingerprint, output, make)
+    nodes = {"metadata": ("merged", lambda: fingerprint(slides), report_dir / "metadata.json",
+                          lambda: render_metadata(report_dir))}
+    for asset, path in analyses.items():
+        nodes[f"analysis/{asset}"] = ("authored", lambda a=asset: fingerprint(slides.get(a, [])), path, None)
+    nodes["summary"] = ("authored", analysis_hashes, report_dir / "summary.json", None)
+    special = report_dir.name.endswith("-special")
+    nodes[DATES_NAME] = ("authored" if special else "generated", analysis_hashes, report_dir / DATES_NAME,
+                         lambda: render_dates(report_dir))
+
+    results = {}
+    # Locked like a download, so a report is never built from half-written slides
+    with nullcontext() if dry_run else archive.report_lock(report_dir, timeout=LOCK_TIMEOUT):
+        for path in archive.iter_images(report_dir):
+            slides.setdefault(path.parent.name, []).append([path.name, hasher(path)])
+        for name, (kind, inputs, path, make) in nodes.items():
+            result = run_node(name, kind, inputs(), path, make, state, hasher, force, dry_run)
+            if result not in (None, "fresh"):
+                results[name] = result
+    return results
+
+
+def build(root=archive.REPORTS_DIR, force=False, dry_run=False, workers=None):
+    """Bring every report and reports/dates.txt up to date. Returns {report id: {node: result}}."""
+    start = time.time()
+    root = Path(root)
+    with archive.FileLock(STATE_FILE.with_name(STATE_FILE.name + ".lock"), timeout=LOCK_TIMEOUT):
+        all_state = archive.read_json(STATE_FILE) or {}
+        state = all_state.get(str(root), {"hashes": {}, "reports": {}, "archive": {}})
+        hasher = Hasher(root, state["hashes"])
+
+        reports = {archive.report_id(d, root): d for d in archive.iter_reports(root)}
+        existing = [d for d in reports.values() if archive.path_exists(d / DATES_NAME)]
+        # Reports share nothing but the hash cache, so they build independently
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = {rid: pool.submit(build_report, d, state["reports"].setdefault(rid, {}),
+                                        hasher, force, dry_run)
+                       for rid, d in reports.items()}
+            changes = {rid: f.result() for rid, f in futures.items()}
+
+        # Archive-wide dates.txt from every report's dates.txt, oldest first
+        dated = [d for d in reports.values() if archive.path_exists(d / DATES_NAME)]
+
+        def merged(dirs):
+            sections = []
+            for d in dirs:
+                title, assets = parse_dates(archive.read_bytes(d / DATES_NAME).decode("utf-8"))
+                sections.append((title + " Special" if d.name.endswith("-special") else title, assets))
+            return merge_dates(sections).encode() if sections else None
+
+        def inputs(dirs):
+            return fingerprint([[archive.report_id(d, root), hasher(d / DATES_NAME)] for d in dirs])
+
+        if DATES_NAME not in state["archive"] and dated != existing:
+            # First build: adopt against the dates.txt files that were there before it added any
+            run_node(DATES_NAME, "generated", inputs(existing), root / DATES_NAME, lambda: merged(existing),
+                     state["archive"], hasher, force, dry_run)
+        result = run_node(DATES_NAME, "generated", inputs(dated), root / DATES_NAME, lambda: merged(dated),
+                          state["archive"], hasher, force, dry_run)
+        if result not in (None, "fresh"):
+            changes["archive"] = {DATES_NAME: result}
+
+        # Forget reports that were removed from the archive
+        state["reports"] = {rid: s for rid, s in state["reports"].items() if rid in reports}
+        state["hashes"] = {k: v for k, v in state["hashes"].items()
+                           if k == DATES_NAME or "/".join(k.split("/")[:2]) in reports}
+        if not dry_run:
+            all_state[str(root)] = state
+            archive.write_json(STATE_FILE, all_state)
+
+    changes = {rid: c for rid, c in changes.items() if c}
+    for rid, results in changes.items():
+        for name, result in results.items():
+            if result != "adopted":
+                print(f"  {rid}: {name} {result}")
+    counts = {}
+    for results in changes.values():
+        for result in results.values():
+            counts[result] = counts.get(result, 0) + 1
+    summary = ", ".join(f"{n} {r}" for r, n in sorted(counts.items())) or "up to date"
+    print(f"Build: {len(reports)} reports, {summary} ({time.time() - start:.2f}s)")
+    if counts.get("stale"):
+        print("Stale nodes are authored files whose inputs changed; update them by hand")
+    if counts.get("conflict"):
+        print("Conflicts are hand-edited outputs whose inputs changed; --force regenerates them")
+    if counts.get("diverged"):
+        print("Diverged outputs were kept as found but differ from what the build would write; "
+              "--force regenerates them")
+    return changes
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Incrementally rebuild the files derived from each report")
+    parser.add_argument("--root", default=str(archive.REPORTS_DIR), help="Archive to build")
+    parser.add_argument("--force", action="store_true", help="Regenerate every derived file")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would change, write nothing")
+    parser.add_argument("--workers", type=int, help="Reports built in parallel (default: CPU count)")
+    args = parser.parse_args()
+
+    build(args.root, force=args.force, dry_run=args.dry_run, workers=args.workers)
@@ -0,0 +1,186 @@
+"""
+Cycles Trading Course - Packed Report Bundles
+Packs a report folder (slides, analysis.json, metadata.json, ...) into one
+`<report>.bundle` file next to it, e.g. reports/2026/03.bundle, so syncing and
+backing up the archive pays one file per report instead of 50-60.
+
+Layout: 16-byte header, the raw file blobs back to back, a JSON index of
+{path: [offset, size, sha256]}, then a 24-byte footer pointing at the index.
+Readers mmap the bundle and slice a single member by offset without unpacking.
+archive.py reads bundles transparently wherever the folder itself is absent.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+MAGIC = b"GANNBNDL"
+VERSION = 1
+SUFFIX = ".bundle"
+HEADER = struct.Struct("<8sII")   # magic, version, reserved
+FOOTER = struct.Struct("<QQ8s")   # index offset, index length, magic
+ALIGN = 8
+
+
+def bundle_path(report_dir):
+    """reports/2026/03 -> reports/2026/03.bundle"""
+    report_dir = Path(report_dir)
+    return report_dir.parent / (report_dir.name + SUFFIX)
+
+
+class Bundle:
+    """Read-only, mmap-backed view of one bundle file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _ = HEADER.unpack_from(self._mm, 0)
+        index_offset, index_len, tail = FOOTER.unpack_from(self._mm, len(self._mm) - FOOTER.size)
+        if magic != MAGIC or tail != MAGIC:
+            raise ValueError(f"{self.path}: not a report bundle")
+        if version != VERSION:
+            raise ValueError(f"{self.path}: unsupported bundle version {version}")
+        self.index = json.loads(self._mm[index_offset:index_offset + index_len])
+        self.files = self.index["files"]
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def names(self):
+        return list(self.files)
+
+    def size(self, name):
+        return self.files[name][1]
+
+    def view(self, name):
+        """Zero-copy memoryview of one member."""
+        offset, size, _ = self.files[name]
+        return memoryview(self._mm)[offset:offset + size]
+
+    def read(self, name):
+        offset, size, _ = self.files[name]
+        return self._mm[offset:offset + size]
+
+    def read_range(self, name, start, end):
+        """Bytes [start, end) of one member (for HTTP range requests)."""
+        offset, size, _ = self.files[name]
+        start, end = max(0, start), min(size, end)
+        return self._mm[offset + start:offset + end]
+
+
+def pack(report_dir, dest=None):
+    """Write every file under report_dir into a bundle. Returns the bundle path."""
+    report_dir = Path(report_dir)
+    dest = Path(dest) if dest else bundle_path(report_dir)
+    tmp = dest.with_name(dest.name + ".tmp")
+
+    files = {}
+    with open(tmp, "wb") as out:
+        out.write(HEADER.pack(MAGIC, VERSION, 0))
+        for path in sorted(p for p in report_dir.rglob("*") if p.is_file()):
+            data = path.read_bytes()
+            pad = -out.tell() % ALIGN
+            out.write(b"\0" * pad)
+            files[path.relative_to(report_dir).as_posix()] = [
+                out.tell(), len(data), hashlib.sha256(data).hexdigest()]
+            out.write(data)
+
+        index = json.dumps({"version": VERSION, "report": report_dir.name, "files": files},
+                           ensure_ascii=False, separators=(",", ":")).encode()
+        index_offset = out.tell()
+        out.write(index)
+        out.write(FOOTER.pack(index_offset, len(index), MAGIC))
+        out.flush()
+        os.fsync(out.fileno())
+
+    os.replace(tmp, dest)
+    return dest
+
+
+def unpack(bundle_file, report_dir=None, verify=True):
+    """Expand a bundle back into its folder. Returns the folder path."""
+    bundle_file = Path(bundle_file)
+    report_dir = Path(report_dir) if report_dir else bundle_file.with_suffix("")
+    with Bundle(bundle_file) as b:
+        for name, (_, _, digest) in b.files.items():
+            data = b.read(name)
+            if verify and hashlib.sha256(data).hexdigest() != digest:
+                raise ValueError(f"{bundle_file}: {name} is corrupt")
+            target = report_dir / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+    return report_dir
+
+
+def _remove_tree(report_dir):
+    for path in sorted(report_dir.rglob("*"), key=lambda p: len(p.parts), reverse=True):
+        path.unlink() if path.is_file() else path.rmdir()
+    report_dir.rmdir()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import archive
+
+    parser = argparse.ArgumentParser(description="Pack/unpack report bundles")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_pack = sub.add_parser("pack", help="Pack report folders into bundles")
+    p_pack.add_argument("reports", nargs="*", help="Report ids like 2026/03 (default: all)")
+    p_pack.add_argument("--remove", action="store_true", help="Delete the folder after packing")
+    p_unpack = sub.add_parser("unpack", help="Expand bundles back into folders")
+    p_unpack.add_argument("reports", nargs="*", help="Report ids like 2026/03 (default: all)")
+    p_unpack.add_argument("--remove", action="store_true", help="Delete the bundle after unpacking")
+    p_ls = sub.add_parser("ls", help="List a bundle's index")
+    p_ls.add_argument("report")
+    p_cat = sub.add_parser("cat", help="Write one member to stdout")
+    p_cat.add_argument("report")
+    p_cat.add_argument("name", help="e.g. gold/analysis.json")
+    args = parser.parse_args()
+
+    root = archive.REPORTS_DIR
+    if args.cmd == "pack":
+        dirs = [root / r for r in args.reports] or [
+            d for d in archive.iter_reports() if d.is_dir()]
+        for report_dir in dirs:
+            try:
+                # Don't pack a folder a downloader is still writing to
+                with archive.report_lock(report_dir):
+                    dest = pack(report_dir)
+                    count = sum(1 for p in report_dir.rglob("*") if p.is_file())
+                    print(f"  {archive.report_id(report_dir)}: {count} files -> {dest.name} "
+                          f"({dest.stat().st_size // 1024}KB)")
+                    if args.remove:
+                        _remove_tree(report_dir)
+            except archive.LockTimeout:
+                print(f"  {archive.report_id(report_dir)}: busy, skipped")
+    elif args.cmd == "unpack":
+        bundles = [bundle_path(root / r) for r in args.reports] or sorted(root.glob(f"*/*{SUFFIX}"))
+        for bundle_file in bundles:
+            report_dir = unpack(bundle_file)
+            print(f"  {bundle_file.name} -> {archive.report_id(report_dir)}")
+            if args.remove:
+                bundle_file.unlink()
+    elif args.cmd == "ls":
+        with Bundle(bundle_path(root / args.report)) as b:
+            for name, (offset, size, digest) in b.files.items():
+                print(f"{offset:>10} {size:>9} {digest[:12]} {name}")
+    elif args.cmd == "cat":
+        with Bundle(bundle_path(root / args.report)) as b:
+            sys.stdout.buffer.write(b.view(args.name))
@@ -0,0 +1,194 @@
+"""
+Cycles Trading Course - Cross-Asset Key-Date Confluence
+Loads every asset's key dates and dated statistics from the archived
+analysis.json files into arrays and finds windows of +/-N days where turning
+dates from at least K assets converge (e.g. 11-13 March 2026).
+
+All window sizes are answered from one per-asset cumulative-sum matrix, so a
+full sweep over the archive is a handful of numpy operations.
+"""
+
+import json
+from datetime import date, timedelta
+
+import numpy as np
+
+import archive
+
+KIND_KEY_DATE = 0
+KIND_STATISTIC = 1
+
+DIRECTIONS = {"up": 1, "down": -1}
+
+
+def load_events(root=archive.REPORTS_DIR, include_stats=True):
+    """
+    Flatten the archive into parallel arrays, one entry per asset per day:
+      asset (int8 index into archive.ASSETS), day (int64 days since epoch),
+      kind, direction (+1/-1/0) and probability (nan if unknown).
+    Multi-day key dates are expanded to each day; statistics ranges only mark
+    their end day, which is the date the probability refers to. The same date
+    repeated by a monthly and a special report is counted once.
+    """
+    seen = {}
+    for report_dir in archive.iter_reports(root):
+        for asset in archive.report_assets(report_dir):
+            a = archive.ASSETS.index(asset)
+            analysis = archive.load_analysis(report_dir, asset)
+            for kd in archive.key_dates(analysis):
+                d = kd["start"]
+                while d <= kd["end"]:
+                    seen.setdefault((a, d, KIND_KEY_DATE), (0, np.nan))
+                    d += timedelta(days=1)
+            if not include_stats:
+                continue
+            for st in archive.statistics(analysis):
+                if st["direction"] is None:
+                    continue
+                prob = st["probability"] if st["probability"] is not None else np.nan
+                seen[(a, st["end"], KIND_STATISTIC)] = (DIRECTIONS[st["direction"]], prob)
+
+    keys = sorted(seen)
+    return {
+        "asset": np.array([k[0] for k in keys], dtype=np.int8),
+        "day": np.array([k[1] for k in keys], dtype="datetime64[D]").astype(np.int64),
+        "kind": np.array([k[2] for k in keys], dtype=np.int8),
+        "direction": np.array([seen[k][0] for k in keys], dtype=np.int8),
+        "probability": np.array([seen[k][1] for k in keys], dtype=np.float64),
+    }
+
+
+class ConfluenceIndex:
+    """Per-asset day-count matrix over the archive's date range, with prefix sums."""
+
+    def __init__(self, events):
+        self.events = events
+        self.n_assets = len(archive.ASSETS)
+        self.day0 = int(events["day"].min()) if len(events["day"]) else 0
+        n_days = int(events["day"].max()) - self.day0 + 1 if len(events["day"]) else 0
+
+        offset = events["day"] - self.day0
+        key = events["kind"] == KIND_KEY_DATE
+        self.dates = np.zeros((self.n_assets, n_days), dtype=np.int32)
+        np.add.at(self.dates, (events["asset"][key], offset[key]), 1)
+
+        # Signed, probability-weighted statistics (unknown probability counts as 0.5)
+        prob = np.where(np.isnan(events["probability"]), 0.5, events["probability"])
+        self.bias = np.zeros((self.n_assets, n_days), dtype=np.float64)
+        np.add.at(self.bias, (events["asset"][~key], offset[~key]),
+                  events["direction"][~key] * prob[~key])
+
+        # Prefix sums with a leading zero column: sum over [i, j) = c[:, j] - c[:, i]
+        self.cum_dates = np.concatenate(
+            [np.zeros((self.n_assets, 1), np.int64), np.cumsum(self.dates, axis=1)], axis=1)
+        self.cum_bias = np.concatenate(
+            [np.zeros((self.n_assets, 1)), np.cumsum(self.bias, axis=1)], axis=1)
+
+    @classmethod
+    def from_archive(cls, root=archive.REPORTS_DIR, include_stats=True):
+        return cls(load_events(root, include_stats))
+
+    @property
+    def n_days(self):
+        return self.dates.shape[1]
+
+    def to_date(self, offset):
+        return date(1970, 1, 1) + timedelta(days=int(self.day0 + offset))
+
+    def to_offset(self, value):
+        return (date.fromisoformat(value) - date(1970, 1, 1)).days - self.day0
+
+    def window_sums(self, cum, half_widths):
+        """Sum of `cum`'s underlying matrix over [d-N, d+N] for every N and centre d: (A, len(N), D)."""
+        n = np.asarray(half_widths, dtype=np.int64)[:, None]
+        centres = np.arange(self.n_days)[None, :]
+        lo = np.clip(centres - n, 0, self.n_days)
+        hi = np.clip(centres + n + 1, 0, self.n_days)
+        return cum[:, hi] - cum[:, lo]  # fancy indexing -> (A, len(N), D)
+
+    def coverage(self, half_widths):
+        """Number of distinct assets with a turning date within +/-N of each day: (len(N), D)."""
+        hits = self.window_sums(self.cum_dates, half_widths) > 0
+        return hits.sum(axis=0)
+
+    def clusters(self, half_width, min_assets, start=None, end=None):
+        """
+        Rank windows of +/-half_width days containing dates from >= min_assets assets.
+        Consecutive qualifying centres are merged into one cluster.
+        """
+        counts = self.window_sums(self.cum_dates, [half_width])[:, 0, :]   # (A, D)
+        bias = self.window_sums(self.cum_bias, [half_width])[:, 0, :]
+        n_assets = (counts > 0).sum(axis=0)
+        qualifies = n_assets >= min_assets
+
+        if start:
+            qualifies[:max(0, self.to_offset(start))] = False
+        if end:
+            qualifies[max(0, self.to_offset(end) + 1):] = False
+        if not qualifies.any():
+            return []
+
+        # Run-length boundaries of the qualifying mask
+        padded = np.concatenate([[False], qualifies, [False]]).astype(np.int8)
+        edges = np.flatnonzero(np.diff(padded))
+        runs = edges.reshape(-1, 2)
+
+        total = counts.sum(axis=0)
+        result = []
+        for run_start, run_end in runs:
+            span = slice(run_start, run_end)
+            # Best centre: most assets, then most dates
+            score = n_assets[span] * 1000 + total[span]
+            centre = run_start + int(np.argmax(score))
+            lo = max(0, run_start - half_width)
+            hi = min(self.n_days, run_end + half_width)
+            in_window = self.dates[:, lo:hi].sum(axis=1)
+            assets = [archive.ASSETS[i] for i in np.flatnonzero(counts[:, centre])]
+            days = sorted({self.to_date(lo + d) for d in np.flatnonzero(self.dates[:, lo:hi].any(axis=0))})
+            result.append({
+                "centre": self.to_date(centre).isoformat(),
+                "start": days[0].isoformat(),
+                "end": days[-1].isoformat(),
+                "n_assets": int(n_assets[centre]),
+                "assets": assets,
+                "n_dates": int(counts[:, centre].sum()),
+                "dates_in_cluster": {archive.ASSETS[i]: int(c) for i, c in enumerate(in_window) if c},
+                "bias": {archive.ASSETS[i]: round(float(bias[i, centre]), 2)
+                         for i in range(self.n_assets) if bias[i, centre]},
+            })
+
+        result.sort(key=lambda c: (-c["n_assets"], -c["n_dates"], c["centre"]))
+        return result
+
+    def sweep(self, half_widths, min_assets):
+        """Number of qualifying centre days for every N and every K >= min_assets: {N: {K: days}}."""
+        cover = self.coverage(half_widths)                              # (len(N), D)
+        ks = np.arange(1, self.n_assets + 1)
+        table = (cover[:, None, :] >= ks[None, :, None]).sum(axis=2)    # (len(N), len(K))
+        return {int(n): {int(k): int(table[i, k - 1]) for k in ks if k >= min_assets}
+                for i, n in enumerate(half_widths)}
+
+
+def parse_range(value):
+    lo, _, hi = value.partition("-")
+    return list(range(int(lo), int(hi or lo) + 1))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Find cross-asset key-date clusters")
+    parser.add_argument("--window", type=int, default=1, help="Half-width N of the +/-N day window")
+    parser.add_argument("--min-assets", type=int, default=3, help="Minimum distinct assets K")
+    parser.add_argument("--from", dest="start", help="Only clusters centred on/after YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", help="Only clusters centred on/before YYYY-MM-DD")
+    parser.add_argument("--top", type=int, default=20, help="How many clusters to print")
+    parser.add_argument("--no-stats", action="store_true", help="Ignore directional statistics")
+    parser.add_argument("--sweep", help="Count qualifying days for a range of N, e.g. 0-7")
+    args = parser.parse_args()
+
+    index = ConfluenceIndex.from_archive(include_stats=not args.no_stats)
+    if args.sweep:
+        print(json.dumps(index.sweep(parse_range(args.sweep), args.min_assets), indent=2))
+    else:
+        found = index.clusters(args.window, args.min_assets, args.start, args.end)
+        print(json.dumps(found[:args.top], indent=2, ensure_ascii=False))
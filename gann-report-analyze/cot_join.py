@@ -0,0 +1,209 @@
+"""
+Cycles Trading Course - COT Positioning vs Report Key Dates
+Maps the report assets to their CFTC COT contracts, loads non-commercial
+positioning history into per-asset arrays, and joins it against every key
+date and statistic in the archive in one batched computation.
+
+History comes from cot_report/cot_data.json snapshots and/or the Supabase
+cot_data table that cot_scraper.js fills (one scan per week).
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from dotenv import load_dotenv
+
+import archive
+from confluence import KIND_KEY_DATE, KIND_STATISTIC, load_events
+
+load_dotenv(Path(__file__).parent / ".env")
+
+COT_JSON = Path(__file__).parent.parent / "cot_report" / "cot_data.json"
+
+# Report asset -> CFTC contract code (see cot_report/cot_data.json)
+COT_CODES = {
+    "sp500": "13874A",    # E-MINI S&P 500
+    "bitcoin": "133741",  # BITCOIN
+    "eurusd": "099741",   # EURO FX
+    "gold": "088691",     # GOLD
+    "oil": "067651",      # CRUDE OIL, LIGHT SWEET
+}
+CODE_ASSETS = {code: asset for asset, code in COT_CODES.items()}
+
+# COT is weekly (Tuesday positions); older than this and the event has no current report
+MAX_AGE_DAYS = 10
+# Holiday weeks shift a release by a day or two; a bigger gap means missing snapshots
+WEEK_SLACK_DAYS = 3
+
+FIELDS = ["long", "short", "net", "open_interest", "chg_long", "chg_short", "pct_long", "pct_short"]
+
+
+def rows_from_json(paths):
+    """Flatten cot_data.json snapshots ({category: [instrument, ...]}) into rows for the report assets."""
+    rows = []
+    for path in paths:
+        data = archive.read_json(path) or {}
+        for instruments in data.values():
+            for item in instruments:
+                if item.get("code") not in CODE_ASSETS:
+                    continue
+                nc = item.get("non_commercial", {})
+                chg = item.get("changes", {})
+                pct = item.get("pct_of_open_interest", {})
+                rows.append({
+                    "code": item["code"], "report_date": item["report_date"],
+                    "long": nc.get("long"), "short": nc.get("short"), "net": nc.get("net"),
+                    "open_interest": item.get("open_interest"),
+                    "chg_long": chg.get("long"), "chg_short": chg.get("short"),
+                    "pct_long": pct.get("long"), "pct_short": pct.get("short"),
+                })
+    return rows
+
+
+def rows_from_db(dsn):
+    """Read the report assets' history from the Supabase cot_data table."""
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT code, report_date::text, nc_long, nc_short, nc_net, open_interest,
+                       chg_long, chg_short, pct_long, pct_short
+                FROM cot_data WHERE code = ANY(%s) AND report_date IS NOT NULL
+            """, (list(CODE_ASSETS),))
+            columns = ["code", "report_date"] + FIELDS
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+    finally:
+        conn.close()
+
+
+def to_arrays(rows):
+    """
+    Build {asset: {"day": int64 days since epoch, <field>: float64, "wow_net": ...}}
+    sorted by report date; repeated scans of the same week keep the last row.
+    """
+    latest = {}
+    for row in rows:
+        latest[(row["code"], row["report_date"])] = row
+
+    cot = {}
+    for asset, code in COT_CODES.items():
+        weeks = sorted(k[1] for k in latest if k[0] == code)
+        if not weeks:
+            continue
+        table = [latest[(code, w)] for w in weeks]
+        arrays = {"day": np.array(weeks, dtype="datetime64[D]").astype(np.int64)}
+        for field in FIELDS:
+            arrays[field] = np.array([np.nan if r[field] is None else r[field] for r in table],
+                                     dtype=np.float64)
+        # Week-over-week net change: from history where available, else the report's own changes
+        reported = arrays["chg_long"] - arrays["chg_short"]
+        from_history = np.concatenate([[np.nan], np.diff(arrays["net"])])
+        consecutive = np.concatenate([[False], np.diff(arrays["day"]) <= 7])
+        arrays["wow_net"] = np.where(consecutive, from_history, reported)
+        cot[asset] = arrays
+    return cot
+
+
+def join_events(cot, events, weeks_before=2, max_age=MAX_AGE_DAYS):
+    """
+    For every event (see confluence.load_events) attach the latest COT report
+    on or before the event day and the net change over the preceding
+    `weeks_before` reports. Returns parallel arrays aligned with `events`;
+    values are nan where history is missing or older than `max_age` days, and
+    net_change is nan where snapshots are missing in between, so the
+    `weeks_before` reports back don't span that many weeks.
+    """
+    n = len(events["day"])
+    out = {
+        "cot_day": np.full(n, -1, dtype=np.int64),
+        "net": np.full(n, np.nan), "long": np.full(n, np.nan), "short": np.full(n, np.nan),
+        "pct_long": np.full(n, np.nan), "wow_net": np.full(n, np.nan),
+        "net_change": np.full(n, np.nan),
+    }
+    for a, asset in enumerate(archive.ASSETS):
+        if asset not in cot:
+            continue
+        arrays = cot[asset]
+        mask = events["asset"] == a
+        # Index of the last report released on/before each event day
+        days = events["day"][mask]
+        idx = np.searchsorted(arrays["day"], days, side="right") - 1
+        valid = (idx >= 0) & (days - arrays["day"][np.maximum(idx, 0)] <= max_age)
+        rows = np.flatnonzero(mask)[valid]
+        idx = idx[valid]
+
+        out["cot_day"][rows] = arrays["day"][idx]
+        for field in ("net", "long", "short", "pct_long", "wow_net"):
+            out[field][rows] = arrays[field][idx]
+
+        prior = idx - weeks_before
+        has_prior = prior >= 0
+        gap = arrays["day"][idx] - arrays["day"][np.maximum(prior, 0)]
+        has_prior &= gap <= 7 * weeks_before + WEEK_SLACK_DAYS
+        out["net_change"][rows[has_prior]] = arrays["net"][idx[has_prior]] - arrays["net"][prior[has_prior]]
+        if weeks_before == 1:
+            # A single snapshot still knows its own week-over-week change
+            missing = ~has_prior
+            out["net_change"][rows[missing]] = arrays["wow_net"][idx[missing]]
+    return out
+
+
+def summarize(events, joined, asset=None, kind=None, direction=None):
+    """Per-event records (for JSON output) filtered by asset/kind/direction."""
+    mask = np.ones(len(events["day"]), dtype=bool)
+    if asset:
+        mask &= events["asset"] == archive.ASSETS.index(asset)
+    if kind is not None:
+        mask &= events["kind"] == kind
+    if direction:
+        mask &= events["direction"] == {"up": 1, "down": -1}[direction]
+
+    def iso(day):
+        return str(np.datetime64(int(day), "D"))
+
+    def num(value):
+        return None if np.isnan(value) else float(value)
+
+    records = []
+    for i in np.flatnonzero(mask):
+        records.append({
+            "asset": archive.ASSETS[events["asset"][i]],
+            "date": iso(events["day"][i]),
+            "kind": "key_date" if events["kind"][i] == KIND_KEY_DATE else "statistic",
+            "cot_report": iso(joined["cot_day"][i]) if joined["cot_day"][i] >= 0 else None,
+            "net": num(joined["net"][i]),
+            "pct_long": num(joined["pct_long"][i]),
+            "wow_net": num(joined["wow_net"][i]),
+            "net_change": num(joined["net_change"][i]),
+        })
+    return records
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Join COT positioning with report key dates")
+    parser.add_argument("--json", nargs="*", default=[str(COT_JSON)],
+                        help="cot_data.json snapshot files to load")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"),
+                        help="Also load history from the Supabase cot_data table")
+    parser.add_argument("--asset", choices=archive.ASSETS)
+    parser.add_argument("--kind", choices=["key_date", "statistic"])
+    parser.add_argument("--direction", choices=["up", "down"])
+    parser.add_argument("--weeks-before", type=int, default=2,
+                        help="Net change measured over this many COT reports")
+    args = parser.parse_args()
+
+    rows = rows_from_json(args.json)
+    if args.dsn:
+        rows += rows_from_db(args.dsn)
+    cot = to_arrays(rows)
+    events = load_events()
+    joined = join_events(cot, events, weeks_before=args.weeks_before)
+
+    kind = {"key_date": KIND_KEY_DATE, "statistic": KIND_STATISTIC}.get(args.kind)
+    records = summarize(events, joined, asset=args.asset, kind=kind, direction=args.direction)
+    print(json.dumps(records, indent=2, ensure_ascii=False))
@@ -0,0 +1,138 @@
+"""
+Cycles Trading Course - Low-Memory Crawler Profile
+Chromium settings and a resident-memory monitor for download_report.py on
+small (1-2 GB) runners, where large reports used to be OOM-killed while
+scrolling.
+
+The profile trims Chromium to one renderer with no GPU stack, low-end-device
+mode and no disk/memory cache, keeps a single page, recycles the browser
+context every few reports (cookies carried over, no re-login), and samples
+the RSS of this process plus every child (driver, browser, renderers) from
+/proc to report the peak against a budget.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+
+PROFILES = ["default", "low-memory"]
+MEMORY_BUDGET_MB = 1024
+RECYCLE_EVERY = 3
+SAMPLE_INTERVAL = 0.5
+
+LOW_MEMORY_ARGS = [
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-dev-shm-usage",
+    "--enable-low-end-device-mode",
+    "--renderer-process-limit=1",
+    "--disable-site-isolation-trials",
+    "--disable-features=site-per-process,Translate,BackForwardCache,MediaRouter,OptimizationHints",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--mute-audio",
+    "--disk-cache-size=1",
+    "--media-cache-size=1",
+    "--js-flags=--max-old-space-size=256",
+]
+
+
+def launch_options(profile, headless=True):
+    options = {"headless": headless}
+    if profile == "low-memory":
+        options["args"] = LOW_MEMORY_ARGS
+    return options
+
+
+def context_options(profile):
+    if profile != "low-memory":
+        return {}
+    # Small viewport, 1x pixels: less compositor memory while scrolling image-heavy pages
+    return {"viewport": {"width": 1024, "height": 768}, "device_scale_factor": 1,
+            "service_workers": "block"}
+
+
+def disable_cache(page):
+    """Turn off Chromium's HTTP cache (memory and disk) for a page via CDP."""
+    session = page.context.new_cdp_session(page)
+    session.send("Network.enable")
+    session.send("Network.setCacheDisabled", {"cacheDisabled": True})
+    return session
+
+
+def process_tree_rss(root_pid=None):
+    """Resident memory in bytes of a process and all its descendants, from /proc; None elsewhere."""
+    root_pid = root_pid or os.getpid()
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+    children, rss = {}, {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            status = (entry / "status").read_text()
+        except OSError:
+            continue
+        fields = dict(line.split(":", 1) for line in status.splitlines() if ":" in line)
+        pid = int(entry.name)
+        children.setdefault(int(fields.get("PPid", "0").strip()), []).append(pid)
+        # Kernel threads have no VmRSS
+        rss[pid] = int(fields.get("VmRSS", "0 kB").split()[0]) * 1024
+
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total
+
+
+class MemoryMonitor:
+    """Background sampler of process-tree RSS; tracks the peak and budget overruns."""
+
+    def __init__(self, budget_mb=MEMORY_BUDGET_MB, interval=SAMPLE_INTERVAL):
+        self.budget = budget_mb * 1024 * 1024
+        self.interval = interval
+        self.peak = 0
+        self.run_peak = 0
+        self.over_budget = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.is_set():
+            rss = process_tree_rss()
+            if rss is None:
+                return
+            if rss > self.peak:
+                self.peak = rss
+                self.run_peak = max(self.run_peak, rss)
+            if rss > self.budget and not self.over_budget:
+                self.over_budget = True
+                print(f"  [memory] {rss >> 20}MB exceeds budget {self.budget >> 20}MB")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2)
+
+    def reset(self):
+        """Start a new per-report peak (the run-wide peak is kept)."""
+        self.peak = 0
+        self.over_budget = False
+
+    def report(self, profile):
+        """Numbers recorded in the report's crawl.json."""
+        return {"profile": profile, "peak_rss_mb": round(self.peak / 2 ** 20, 1),
+                "run_peak_rss_mb": round(self.run_peak / 2 ** 20, 1),
+                "budget_mb": self.budget >> 20, "over_budget": self.peak > self.budget,
+                "measured_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
@@ -0,0 +1,197 @@
+"""
+Cycles Trading Course - Dashboard Feed Builder
+Compiles what the GannForce dashboard needs for its first paint into one
+compact file, GannForce/public/dashboard_feed.json (plus a .gz twin):
+
+  report     current month's key dates, statistics and levels per asset
+  sentiment  latest long/short split for the report assets
+  cot        latest non-commercial positioning for the report assets
+
+Tables are {"cols": [...], "rows": [[...], ...]} to keep the payload small.
+Each section carries a content hash and is only recomputed when one of its
+input files changed (scraper snapshots are only parsed when their file did);
+when nothing changed the feed files are left untouched so their ETags stay
+valid.
+"""
+
+import gzip
+import hashlib
+import json
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+import archive
+from cot_join import COT_CODES, rows_from_json
+from sentiment_store import ASSET_SYMBOLS
+
+HERE = Path(__file__).parent
+ROOT = HERE.parent
+OUT_DIR = ROOT / "GannForce" / "public"
+FEED_NAME = "dashboard_feed.json"
+STATE_FILE = HERE / "feed_state.json"
+
+# Scraper output and the copies GannForce serves; the newest snapshot wins
+SENTIMENT_FILES = [ROOT / "market_sentiment" / "sentiment_data.json",
+                   OUT_DIR / "sentiment_data.json"]
+COT_FILES = [ROOT / "cot_report" / "cot_data.json", OUT_DIR / "cot_data.json"]
+
+FEED_VERSION = 1
+
+
+def table(rows, cols):
+    def value(v):
+        return v.isoformat() if isinstance(v, date) else v
+    return {"cols": cols, "rows": [[value(row[c]) for c in cols] for row in rows]}
+
+
+def section_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False,
+                                     separators=(",", ":")).encode()).hexdigest()[:16]
+
+
+def current_report(root=archive.REPORTS_DIR, today=None):
+    """This month's report folder, else the latest monthly report before it."""
+    today = today or date.today()
+    this_month = f"{today.year}/{today.month:02d}"
+    monthly = [d for d in archive.iter_reports(root)
+               if len(d.name) == 2 and d.name.isdigit()
+               and archive.report_id(d, root) <= this_month]
+    return max(monthly, key=lambda d: archive.report_id(d, root), default=None)
+
+
+def newest_snapshot(paths, stamp, seen):
+    """
+    The readable JSON file among `paths` with the latest `stamp(data)`, or None.
+    `seen` ({path: [version, stamp]}, kept in the state file) is updated, and
+    only files whose version changed since are read and parsed.
+    """
+    best = None
+    for path in paths:
+        version = archive.file_version(path)
+        if version is None:
+            seen.pop(str(path), None)
+            continue
+        known = seen.get(str(path))
+        if known and known[0] == list(version):
+            value = known[1]
+        else:
+            data = archive.read_json(path)
+            if not data:
+                continue
+            value = stamp(data)
+            seen[str(path)] = [list(version), value]
+        if best is None or value > best[1]:
+            best = (path, value)
+    return best[0] if best else None
+
+
+def build_report(report_dir, root=archive.REPORTS_DIR):
+    meta = archive.read_json(report_dir / "metadata.json") or {}
+    assets = {}
+    for asset in archive.report_assets(report_dir):
+        analysis = archive.load_analysis(report_dir, asset)
+        assets[asset] = {
+            "key_dates": table(archive.key_dates(analysis), ["start", "end", "description"]),
+            "statistics": table(archive.statistics(analysis),
+                                ["start", "end", "probability", "direction", "description"]),
+            "levels": table(archive.levels(analysis), ["kind", "low", "high", "level"]),
+            "summary": (analysis or {}).get("summary", ""),
+        }
+    return {"id": archive.report_id(report_dir, root), "title": meta.get("title"), "assets": assets}
+
+
+def build_sentiment(data):
+    by_symbol = {row["symbol"]: row for row in data.get("data", [])}
+    assets = {}
+    for asset, symbols in ASSET_SYMBOLS.items():
+        row = next((by_symbol[s] for s in symbols if s in by_symbol), None)
+        if row:
+            assets[asset] = [row["symbol"], row.get("long_pct"), row.get("short_pct")]
+    return {"source": data.get("source"), "scraped_at": data.get("scraped_at"),
+            "cols": ["symbol", "long_pct", "short_pct"], "assets": assets}
+
+
+def build_cot(path):
+    latest = {}
+    for row in rows_from_json([path]):
+        if row["code"] not in latest or row["report_date"] > latest[row["code"]]["report_date"]:
+            latest[row["code"]] = row
+    cols = ["report_date", "net", "long", "short", "chg_long", "chg_short", "pct_long",
+            "pct_short", "open_interest"]
+    assets = {asset: [latest[code][c] for c in cols]
+              for asset, code in COT_CODES.items() if code in latest}
+    return {"cols": cols, "assets": assets}
+
+
+def inputs_report(report_dir):
+    if report_dir is None:
+        return None
+    paths = [report_dir / "metadata.json"] + [report_dir / a / "analysis.json" for a in archive.ASSETS]
+    return [str(report_dir)] + [archive.file_version(p) for p in paths]
+
+
+def build(out_dir=OUT_DIR, force=False, today=None):
+    """Rebuild changed sections and rewrite the feed if any hash moved. Returns the feed dict."""
+    out = Path(out_dir) / FEED_NAME
+    all_state = archive.read_json(STATE_FILE) or {}
+    state = {} if force else all_state.get(str(out), {})
+    previous = ({} if force else (archive.read_json(out) or {})).get("sections", {})
+
+    report_dir = current_report(today=today)
+    seen = state.setdefault("snapshots", {})
+    sentiment_path = newest_snapshot(SENTIMENT_FILES, lambda d: d.get("scraped_at") or "", seen)
+    cot_path = newest_snapshot(COT_FILES, lambda d: max(
+        (i.get("report_date") or "" for items in d.values() if isinstance(items, list) for i in items),
+        default=""), seen)
+
+    builders = {
+        "report": (inputs_report(report_dir), lambda: build_report(report_dir)),
+        "sentiment": ([str(sentiment_path), archive.file_version(sentiment_path)] if sentiment_path else None,
+                      lambda: build_sentiment(archive.read_json(sentiment_path))),
+        "cot": ([str(cot_path), archive.file_version(cot_path)] if cot_path else None,
+                lambda: build_cot(cot_path)),
+    }
+
+    sections, changed = {}, []
+    for name, (inputs, make) in builders.items():
+        if inputs is None:
+            continue
+        inputs = json.loads(json.dumps(inputs))  # tuples -> lists, as stored
+        old = previous.get(name)
+        if old and state.get(name) == inputs:
+            sections[name] = old
+            continue
+        data = make()
+        digest = section_hash(data)
+        state[name] = inputs
+        sections[name] = {"hash": digest, "data": data}
+        if not old or old.get("hash") != digest:
+            changed.append(name)
+
+    feed = {"version": FEED_VERSION, "sections": sections}
+    if changed or not out.exists() or set(sections) != set(previous):
+        feed["generated_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        feed["hash"] = section_hash({k: v["hash"] for k, v in sections.items()})
+        body = json.dumps(feed, ensure_ascii=False, separators=(",", ":")).encode()
+        out.parent.mkdir(parents=True, exist_ok=True)
+        archive.atomic_write(out, body)
+        archive.atomic_write(out.with_name(out.name + ".gz"), gzip.compress(body, 9, mtime=0))
+        print(f"Feed {out}: {len(body) // 1024}KB, rebuilt {', '.join(changed) or 'layout'}")
+    else:
+        feed = archive.read_json(out)
+        print(f"Feed {out}: unchanged")
+    all_state[str(out)] = state
+    archive.write_json(STATE_FILE, all_state)
+    return feed
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the compact GannForce dashboard feed")
+    parser.add_argument("--out-dir", default=str(OUT_DIR), help="Where dashboard_feed.json(.gz) go")
+    parser.add_argument("--force", action="store_true", help="Rebuild every section")
+    parser.add_argument("--date", help="Pretend today is this date (YYYY-MM-DD) when picking the report")
+    args = parser.parse_args()
+
+    today = date.fromisoformat(args.date) if args.date else None
+    build(args.out_dir, force=args.force, today=today)
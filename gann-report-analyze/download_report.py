@@ -1,27 +1,47 @@
 """
 Cycles Trading Course - Report Image Downloader
 Logs in, opens the latest report, downloads all images organized by asset folder.
+`--mode http` does the same over plain HTTP (http_client.py) without launching
+Chromium; `--mode auto` tries that first and falls back to the browser.
+`--record run.zip` saves the browser session's traffic as a HAR and
+`--replay run.zip` serves it back offline, so detection and classification
+can be re-run against a frozen copy of a report.
+`--profile low-memory` (crawl_profile.py) trims Chromium for 1-2 GB runners
+and records the run's peak RSS in the report's crawl.json.
 """
 
 import base64
 import os
 import re
+import subprocess
 import sys
+import time
 import json
 from pathlib import Path
 from urllib.parse import unquote
 
+import requests
 from dotenv import load_dotenv
-from playwright.sync_api import sync_playwright
+
+import archive
+import bundle
+import crawl_profile
+import http_client
 
 load_dotenv(Path(__file__).parent / ".env")
 
 URL = "https://cyclestrading-course.com/"
-EMAIL = os.environ["EMAIL"]
-PASSWORD = os.environ["PASSWORD"]
+EMAIL = os.environ.get("EMAIL")
+PASSWORD = os.environ.get("PASSWORD")
 
 REPORTS_DIR = Path(__file__).parent / "reports"
 
+# How long to wait for another downloader working on the same report
+LOCK_TIMEOUT = 10 * 60
+
+# Output of detached backfill runs
+BACKFILL_LOG = Path(__file__).parent / "backfill.log"
+
 # Hebrew month names to English for folder structure
 HEBREW_MONTHS = {
     "ינואר": "01", "פברואר": "02", "מרץ": "03",
@@ -238,8 +258,86 @@ def map_images_to_assets(items):
     return assignments, images
 
 
-def download_images(page, images, assignments, report_dir):
-    """Download all images via browser fetch (bypasses hotlink protection)."""
+def select_images(images, assignments, assets=None, priority=None):
+    """
+    Split images into (now, later) by section.
+    `assets`: only these sections are fetched now, the rest is dropped.
+    `priority`: these sections are fetched first, the rest is returned as `later`.
+    Priority sections keep the order given, e.g. ["gold", "oil"].
+    """
+    wanted = assets or priority
+    if not wanted:
+        return images, []
+    rank = {asset: i for i, asset in enumerate(wanted)}
+    now = [img for img in images if assignments.get(img["idx"], "other") in rank]
+    now.sort(key=lambda img: (rank[assignments.get(img["idx"], "other")], img["idx"]))
+    later = [] if assets else [img for img in images if assignments.get(img["idx"], "other") not in rank]
+    return now, later
+
+
+def start_backfill(report_url, headless=True, mode="browser", session=None, profile="default",
+                   lock_timeout=LOCK_TIMEOUT):
+    """
+    Fetch the rest of a report in a detached download_report.py run (existing files are skipped).
+    Its output is appended to backfill.log.
+    """
+    cmd = [sys.executable, "-u", str(Path(__file__).resolve()), "--url", report_url, "--mode", mode,
+           "--profile", profile, "--lock-timeout", str(lock_timeout)]
+    if not headless:
+        cmd.append("--headed")
+    if session:
+        cmd += ["--session", str(Path(session).resolve())]
+    if REPORTS_DIR != archive.REPORTS_DIR:
+        # --out only rebinds REPORTS_DIR in this process
+        cmd += ["--out", str(REPORTS_DIR)]
+    with open(BACKFILL_LOG, "a", encoding="utf-8") as log:
+        log.write(f"\n=== {time.strftime('%Y-%m-%d %H:%M:%S')} backfill {report_url}\n")
+        log.flush()
+        proc = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                start_new_session=True)
+    print(f"Backfill started in background (pid {proc.pid}), log: {BACKFILL_LOG}")
+    return proc
+
+
+def fetch_image(page, src, direct=False):
+    """
+    Image bytes through the logged-in session (browser page or SiteClient), or None.
+    `direct` fetches with the context's request API instead of inside the page,
+    so large slides never pass through the renderer as base64 strings.
+    """
+    if isinstance(page, http_client.SiteClient):
+        return page.fetch_bytes(src, referer=page.url)
+    if direct:
+        resp = page.request.get(src, headers={"Referer": page.url})
+        if not resp.ok or resp.headers.get("content-type", "").startswith("text/html"):
+            return None
+        return resp.body()
+    # Fetch image through the browser's authenticated session (bypasses hotlink protection)
+    b64 = page.evaluate("""async (url) => {
+        const resp = await fetch(url, { credentials: 'include' });
+        if (!resp.ok) return null;
+        const blob = await resp.blob();
+        return new Promise((resolve) => {
+            const reader = new FileReader();
+            reader.onloadend = () => resolve(reader.result.split(',')[1]);
+            reader.readAsDataURL(blob);
+        });
+    }""", src)
+    return base64.b64decode(b64) if b64 else None
+
+
+def download_images(page, images, assignments, report_dir, refetch=None, lock=None, direct=False):
+    """
+    Download all images with fetch_image(), each written atomically.
+    Files listed in the `refetch` set (report-relative paths queued by verify_archive.py)
+    are downloaded again even if they exist and removed from the set once written.
+    Returns (manifest, fetched, failed): the report's manifest with every write
+    recorded, which the caller commits with archive.write_manifest() once the
+    report is complete, and how many slides were written and how many were not.
+    """
+    refetch = refetch if refetch is not None else set()
+    manifest = archive.load_manifest(report_dir)
+    fetched = failed = 0
     for img in images:
         idx = img["idx"]
         src = img["src"]
@@ -254,37 +352,36 @@ def download_images(page, images, assignments, report_dir):
         filename = f"{idx:02d}{ext}"
 
         filepath = folder / filename
-        if filepath.exists():
+        if lock:
+            lock.refresh()
+        if filepath.exists() and f"{asset}/{filename}" not in refetch:
             print(f"  Skip {asset}/{filename} (exists)")
             continue
 
         try:
-            # Fetch image through the browser's authenticated session
-            b64 = page.evaluate("""async (url) => {
-                const resp = await fetch(url, { credentials: 'include' });
-                if (!resp.ok) return null;
-                const blob = await resp.blob();
-                return new Promise((resolve) => {
-                    const reader = new FileReader();
-                    reader.onloadend = () => resolve(reader.result.split(',')[1]);
-                    reader.readAsDataURL(blob);
-                });
-            }""", src)
-
-            if b64:
-                data = base64.b64decode(b64)
-                filepath.write_bytes(data)
+            data = fetch_image(page, src, direct=direct)
+            if data:
+                archive.atomic_write(filepath, data)
+                manifest["files"][f"{asset}/{filename}"] = {
+                    "size": len(data), "sha256": archive.sha256_bytes(data), "src": src,
+                }
+                refetch.discard(f"{asset}/{filename}")
+                fetched += 1
                 print(f"  {asset}/{filename} ({len(data) // 1024}KB)")
             else:
-                print(f"  FAILED {asset}/{filename}: fetch returned null")
+                failed += 1
+                print(f"  FAILED {asset}/{filename}: fetch returned nothing")
         except Exception as e:
+            failed += 1
             print(f"  FAILED {asset}/{filename}: {e}")
 
-    return report_dir
+    return manifest, fetched, failed
 
 
 def login(page):
     """Log in to the site and return the authenticated page."""
+    if not EMAIL or not PASSWORD:
+        sys.exit("Set EMAIL and PASSWORD in .env")
     print(f"Navigating to {URL} ...")
     page.goto(URL, wait_until="domcontentloaded")
     page.get_by_role("link", name="התחבר").click()
@@ -356,16 +453,12 @@ def title_to_path(title):
     return Path(year) / month_num
 
 
-def download_report(page, report_url):
-    """Download a single report given its URL. Returns report_dir path."""
+def open_report_page(page, report_url):
+    """Load a report in the browser. Returns (title, items, protection) like SiteClient.open_report."""
     page.goto(report_url, wait_until="domcontentloaded")
     page.wait_for_timeout(3000)
 
     title = page.title().replace(" – סייקלס טריידינג", "").strip()
-    print(f"Report: {title}")
-
-    report_dir = REPORTS_DIR / title_to_path(title)
-    report_dir.mkdir(parents=True, exist_ok=True)
 
     # Check for group/password protection (LearnDash)
     pw_check = page.evaluate("""() => {
@@ -377,9 +470,6 @@ def download_report(page, report_url):
         if (ld && ld.textContent.includes('מוגן')) return 'LEARNDASH_GROUP_PROTECTED';
         return null;
     }""")
-    if pw_check:
-        print(f"*** Page protection detected: {pw_check} ***")
-        print("This report requires group membership access that the current account does not have.")
 
     # Scroll full page to trigger lazy loading
     print("Loading all images...")
@@ -392,10 +482,41 @@ def download_report(page, report_url):
     page.evaluate("window.scrollTo(0, 0)")
     page.wait_for_timeout(500)
 
-    # Map images to assets
     print("Analyzing report structure...")
-    items = detect_asset_sections(page)
+    return title, detect_asset_sections(page), pw_check
+
+
+def download_report(page, report_url, assets=None, priority=None, backfill=True, headless=True,
+                    mode="browser", lock_timeout=LOCK_TIMEOUT, profile="default", monitor=None,
+                    direct=False, session=None):
+    """
+    Download a single report given its URL. Returns report_dir path.
+    `page` is a Playwright page or an http_client.SiteClient; with the client,
+    returns None if no slides were found, or none of them could be fetched, so
+    `--mode auto` can retry in the browser.
+    `assets` limits the download to those sections; `priority` downloads them
+    first and leaves the remaining sections to a background backfill run.
+    The report folder is locked for the duration, so concurrent downloaders
+    wait (up to `lock_timeout` seconds) instead of interleaving writes.
+    With a crawl_profile.MemoryMonitor, the peak RSS so far is saved in crawl.json
+    (kept out of metadata.json so it doesn't change the report's content hash).
+    `direct` fetches slides outside the renderer (see fetch_image). `session` is
+    handed to the backfill run so it can log in without EMAIL/PASSWORD.
+    """
+    if isinstance(page, http_client.SiteClient):
+        title, items, pw_check = page.open_report(report_url)
+    else:
+        title, items, pw_check = open_report_page(page, report_url)
+    print(f"Report: {title}")
+    if pw_check:
+        print(f"*** Page protection detected: {pw_check} ***")
+        print("This report requires group membership access that the current account does not have.")
+
+    # Map images to assets
     assignments, images = map_images_to_assets(items)
+    if not images and isinstance(page, http_client.SiteClient):
+        print("No images found in the page HTML")
+        return None
 
     # Summary
     from collections import Counter
@@ -405,74 +526,265 @@ def download_report(page, report_url):
         if asset in counts:
             print(f"  {asset}: {counts[asset]} images")
 
-    # Download via browser fetch
-    print(f"\nDownloading to {report_dir}/")
-    download_images(page, images, assignments, report_dir)
+    now, later = select_images(images, assignments, assets, priority)
+    if assets or priority:
+        print(f"Selected {len(now)} images from: {', '.join(assets or priority)}")
 
-    # Save metadata
-    meta = {"title": title, "url": report_url, "images": len(images), "sections": dict(counts)}
-    (report_dir / "metadata.json").write_text(json.dumps(meta, indent=2, ensure_ascii=False))
+    report_dir = REPORTS_DIR / title_to_path(title)
+    with archive.report_lock(report_dir, timeout=lock_timeout) as lock:
+        if not report_dir.exists() and bundle.bundle_path(report_dir).exists():
+            # Packed report: expand it so existing slides are skipped, not re-fetched
+            bundle.unpack(bundle.bundle_path(report_dir), report_dir)
+            bundle.bundle_path(report_dir).unlink()
+            print(f"Unpacked {bundle.bundle_path(report_dir).name}")
+        report_dir.mkdir(parents=True, exist_ok=True)
+
+        # Files flagged by verify_archive.py get fetched again
+        rid = archive.report_id(report_dir, REPORTS_DIR)
+        # The verify queue only applies to the main archive, not an --out copy
+        use_queue = REPORTS_DIR == archive.REPORTS_DIR
+        refetch = {e["file"] for e in archive.load_redownload_queue()
+                   if e["report"] == rid} if use_queue else set()
+        if refetch:
+            print(f"Re-downloading {len(refetch)} file(s) queued by verify")
+        queued = set(refetch)
+
+        print(f"\nDownloading to {report_dir}/")
+        manifest, fetched, failed = download_images(page, now, assignments, report_dir, refetch=refetch,
+                                                    lock=lock, direct=direct)
+        if failed and not fetched and isinstance(page, http_client.SiteClient):
+            # Hotlink protection or an expired session: the browser may still get them
+            print("No slides could be fetched over HTTP")
+            return None
+
+        meta = {"title": title, "url": report_url, "images": len(images), "sections": dict(counts)}
+        archive.write_json(report_dir / "metadata.json", meta)
+        if monitor:
+            archive.write_json(report_dir / "crawl.json", monitor.report(profile))
+        # Manifest last: it only lists files that are complete on disk
+        archive.write_manifest(report_dir, manifest)
+
+        done = queued - refetch
+        if done:
+            with archive.queue_lock():
+                archive.save_redownload_queue(
+                    [e for e in archive.load_redownload_queue()
+                     if e["report"] != rid or e["file"] not in done])
+
+    if later:
+        if backfill:
+            start_backfill(report_url, headless=headless, mode=mode, session=session, profile=profile,
+                           lock_timeout=lock_timeout)
+        else:
+            print(f"Skipped {len(later)} non-priority images (--no-backfill)")
 
     print(f"\nDone! Report saved to: {report_dir}")
     return report_dir
 
 
-def run(headless=True, url=None, list_year=None, year=None, nth=0):
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=headless)
-        page = browser.new_page()
+def pick_report(reports, year, nth):
+    """URL of the nth report link (see list_links), or None with a message."""
+    if not reports:
+        print(f"No reports found for year {year}")
+        return None
+    if nth >= len(reports):
+        print(f"Only {len(reports)} reports found for {year}, requested index {nth}")
+        return None
+    print(f"Selected report [{nth}/{len(reports)}]: {reports[nth]['title']}")
+    return reports[nth]["url"]
+
 
-        login(page)
-        page.wait_for_timeout(2000)  # Wait for page content to load after login
+def run_http(urls=None, list_year=None, year=None, nth=0, options=None, session=None, fallback=False):
+    """
+    Browserless run through http_client.SiteClient. Returns the report URLs the
+    browser still has to handle: empty when done, or everything left over when
+    `fallback` is set and login or parsing failed.
+    """
+    client = http_client.SiteClient()
+    urls = list(urls or [])
+    try:
+        if session and client.import_session(session):
+            print(f"Using saved session {session}")
+        else:
+            if not EMAIL or not PASSWORD:
+                sys.exit("Set EMAIL and PASSWORD in .env")
+            client.login(EMAIL, PASSWORD)
 
         if list_year:
-            links = page.locator(f'a[href*="{list_year}"]')
-            count = links.count()
-            reports = []
-            for i in range(count):
-                link = links.nth(i)
-                reports.append({
-                    "index": i,
-                    "title": link.text_content().strip(),
-                    "url": link.get_attribute("href")
-                })
-            print(json.dumps(reports, indent=2, ensure_ascii=False))
-            browser.close()
-            return
+            print(json.dumps(client.list_links(list_year), indent=2, ensure_ascii=False))
+            return []
 
-        if url:
-            download_report(page, url)
-        else:
-            # Find report links for the given year (default: 2026)
+        if not urls:
             target_year = year or "2026"
-            links = page.locator(f'a[href*="{target_year}"]')
-            count = links.count()
-            if count == 0:
-                print(f"No reports found for year {target_year}")
-                browser.close()
-                return
-            if nth >= count:
-                print(f"Only {count} reports found for {target_year}, requested index {nth}")
-                browser.close()
+            url = pick_report(client.list_links(target_year), target_year, nth)
+            if not url:
+                return []
+            urls = [url]
+        remaining = []
+        for url in urls:
+            if download_report(client, url, **(options or {})) is None and fallback:
+                remaining.append(url)
+        return remaining
+    except (http_client.LoginError, requests.RequestException) as e:
+        if not fallback:
+            raise
+        print(f"HTTP mode failed: {e}")
+        return urls or None
+    finally:
+        client.close()
+
+
+def run(headless=True, url=None, list_year=None, year=None, nth=0, assets=None, priority=None,
+        backfill=True, mode="browser", session=None, save_session=None, lock_timeout=LOCK_TIMEOUT,
+        record=None, replay=None, profile="default", memory_budget=crawl_profile.MEMORY_BUDGET_MB,
+        recycle_every=crawl_profile.RECYCLE_EVERY):
+    """`url` may be one report URL or a list; a list is downloaded with one page."""
+    urls = [url] if isinstance(url, str) else list(url or [])
+    if record or replay:
+        # A detached backfill run would neither be recorded nor replayed
+        backfill = False
+    options = {"assets": assets, "priority": priority, "backfill": backfill, "headless": headless,
+               "mode": mode, "lock_timeout": lock_timeout, "session": session}
+    if mode in ("http", "auto"):
+        remaining = run_http(urls, list_year, year, nth, options, session, fallback=mode == "auto")
+        if remaining == []:
+            return
+        print("Falling back to browser mode...")
+        urls = remaining or urls
+
+    from playwright.sync_api import sync_playwright
+
+    monitor = crawl_profile.MemoryMonitor(memory_budget).start()
+    # The request API bypasses route_from_har, so replays fetch slides inside the page
+    options.update(profile=profile, monitor=monitor, direct=profile == "low-memory" and not replay)
+    with sync_playwright() as p:
+        browser = p.chromium.launch(**crawl_profile.launch_options(profile, headless))
+        context_options = crawl_profile.context_options(profile)
+
+        def open_context(storage_state=None, recording=bool(record)):
+            # HAR is written when the context closes; .zip keeps bodies as separate entries
+            context = browser.new_context(
+                storage_state=storage_state,
+                **context_options, **({"record_har_path": record} if recording else {}))
+            if replay:
+                # Anything the recording doesn't have fails instead of going online
+                context.route_from_har(replay, not_found="abort")
+            page = context.new_page()
+            if profile == "low-memory":
+                crawl_profile.disable_cache(page)
+            return context, page
+
+        context, page = open_context(recording=False)
+        try:
+            if replay:
+                # Recorded pages are already logged in
+                print(f"Replaying {replay} (offline)")
+                page.goto(URL, wait_until="domcontentloaded")
+            else:
+                login(page)
+                if record:
+                    # Logged in off the record, so the HAR never holds the password
+                    state = context.storage_state()
+                    context.close()
+                    context, page = open_context(state)
+                    page.goto(URL, wait_until="domcontentloaded")
+            page.wait_for_timeout(2000)  # Wait for page content to load after login
+            if save_session:
+                # Cookies for later `--mode http --session` runs
+                context.storage_state(path=save_session)
+                print(f"Session saved to {save_session}")
+
+            def year_links(target_year):
+                links = page.locator(f'a[href*="{target_year}"]')
+                return [{"index": i, "title": links.nth(i).text_content().strip(),
+                         "url": links.nth(i).get_attribute("href")} for i in range(links.count())]
+
+            if list_year:
+                print(json.dumps(year_links(list_year), indent=2, ensure_ascii=False))
                 return
-            report_link = links.nth(nth)
-            report_url = report_link.get_attribute("href")
-            report_title = report_link.text_content().strip()
-            print(f"Selected report [{nth}/{count}]: {report_title}")
-            download_report(page, report_url)
 
-        browser.close()
+            if not urls:
+                # Find report links for the given year (default: 2026)
+                target_year = year or "2026"
+                url = pick_report(year_links(target_year), target_year, nth)
+                urls = [url] if url else []
+
+            for i, report_url in enumerate(urls):
+                due = profile == "low-memory" and i and i % recycle_every == 0
+                if (due or monitor.over_budget) and not record:
+                    # Fresh context, same cookies: drops whatever the renderer accumulated
+                    print("Recycling browser context...")
+                    state = context.storage_state()
+                    context.close()
+                    context, page = open_context(state)
+                monitor.reset()
+                download_report(page, report_url, **options)
+                if profile == "low-memory":
+                    page.goto("about:blank")
+        finally:
+            context.close()
+            if record:
+                print(f"Recorded session to {record}")
+            browser.close()
+            monitor.stop()
+            print(f"Peak memory: {monitor.run_peak >> 20}MB (budget {memory_budget}MB)")
 
 
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Download Cycles Trading reports")
     parser.add_argument("--headed", action="store_true", help="Run browser in headed mode")
-    parser.add_argument("--url", help="Download a specific report by URL")
+    parser.add_argument("--url", nargs="+", help="Download specific report(s) by URL")
     parser.add_argument("--list", dest="list_year", help="List report URLs for a year (e.g. 2025)")
     parser.add_argument("--year", help="Year to download reports from (e.g. 2025)")
     parser.add_argument("--nth", type=int, default=0, help="Which report to pick (0=first/newest)")
+    sections = ["cover", "sp500", "bitcoin", "eurusd", "gold", "oil", "review", "other"]
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--assets", help=f"Only download these sections, comma-separated ({','.join(sections)})")
+    group.add_argument("--priority", help="Download these sections first, backfill the rest in background")
+    parser.add_argument("--no-backfill", action="store_true", help="With --priority, don't fetch the rest")
+    parser.add_argument("--mode", choices=["browser", "http", "auto"], default="browser",
+                        help="http: no browser; auto: try http, fall back to the browser")
+    parser.add_argument("--session", help="Playwright storage_state JSON to reuse for --mode http/auto")
+    parser.add_argument("--save-session", help="After browser login, save cookies to this file")
+    parser.add_argument("--lock-timeout", type=int, default=LOCK_TIMEOUT,
+                        help="Seconds to wait for another downloader on the same report")
+    har = parser.add_mutually_exclusive_group()
+    har.add_argument("--record", metavar="HAR", help="Save the browser traffic to a .har/.zip file")
+    har.add_argument("--replay", metavar="HAR", help="Serve the browser from a recording, offline")
+    parser.add_argument("--out", help="Write reports here instead of reports/ (required with --replay)")
+    parser.add_argument("--profile", choices=crawl_profile.PROFILES, default="default",
+                        help="low-memory: trimmed Chromium for small runners")
+    parser.add_argument("--memory-budget", type=int, default=crawl_profile.MEMORY_BUDGET_MB,
+                        help="Peak RSS budget in MB (browser included)")
+    parser.add_argument("--recycle-every", type=int, default=crawl_profile.RECYCLE_EVERY,
+                        help="low-memory: new browser context after this many reports")
     args = parser.parse_args()
-
-    run(headless=not args.headed, url=args.url, list_year=args.list_year,
-        year=args.year, nth=args.nth)
+    if (args.record or args.replay) and args.mode != "browser":
+        parser.error("--record/--replay need --mode browser")
+    if args.replay and not Path(args.replay).exists():
+        parser.error(f"no such recording: {args.replay}")
+    if args.replay and (not args.out or Path(args.out).resolve() == archive.REPORTS_DIR.resolve()):
+        # A replay must not overwrite the archive or consume its redownload queue
+        parser.error("--replay needs a scratch --out directory")
+    if args.recycle_every < 1:
+        parser.error("--recycle-every must be at least 1")
+    if args.out:
+        REPORTS_DIR = Path(args.out).resolve()
+
+    def section_list(value):
+        names = [s.strip() for s in value.split(",") if s.strip()] if value else None
+        unknown = set(names or []) - set(sections)
+        if unknown:
+            parser.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+        return names
+
+    try:
+        run(headless=not args.headed, url=args.url, list_year=args.list_year,
+            year=args.year, nth=args.nth, assets=section_list(args.assets),
+            priority=section_list(args.priority), backfill=not args.no_backfill,
+            mode=args.mode, session=args.session, save_session=args.save_session,
+            lock_timeout=args.lock_timeout, record=args.record, replay=args.replay,
+            profile=args.profile, memory_budget=args.memory_budget, recycle_every=args.recycle_every)
+    except archive.LockTimeout as e:
+        sys.exit(f"Report is busy: {e}")
@@ -0,0 +1,251 @@
+"""
+Cycles Trading Course - Report Archive Exporter
+Bulk-upserts metadata.json / analysis.json from reports/ into Postgres (Supabase)
+so the GannForce dashboard can read key dates, statistics and levels.
+
+Reports whose content hash matches the one already stored are skipped, and all
+changed reports are written with multi-row statements inside one transaction,
+which also deletes the reports that are no longer in the archive.
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2.extras import Json, execute_values
+
+import archive
+
+load_dotenv(Path(__file__).parent / ".env")
+
+# Rows per multi-row INSERT (execute_values page size)
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS gann_reports (
+  report_id TEXT PRIMARY KEY,           -- "2026/03", "2025/06-special"
+  title TEXT,
+  url TEXT,
+  images INTEGER,
+  sections JSONB,
+  summary JSONB,
+  content_hash TEXT NOT NULL,
+  exported_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS gann_report_assets (
+  report_id TEXT REFERENCES gann_reports(report_id) ON DELETE CASCADE,
+  asset TEXT NOT NULL,                  -- sp500, bitcoin, eurusd, gold, oil
+  asset_name TEXT,
+  seasonal TEXT,
+  summary TEXT,
+  previous_month_review TEXT,
+  insights JSONB,
+  risk_notes JSONB,
+  PRIMARY KEY (report_id, asset)
+);
+
+CREATE TABLE IF NOT EXISTS gann_key_dates (
+  report_id TEXT REFERENCES gann_reports(report_id) ON DELETE CASCADE,
+  asset TEXT NOT NULL,
+  seq INTEGER NOT NULL,
+  start_date DATE NOT NULL,
+  end_date DATE NOT NULL,
+  description TEXT,
+  PRIMARY KEY (report_id, asset, seq)
+);
+
+CREATE TABLE IF NOT EXISTS gann_statistics (
+  report_id TEXT REFERENCES gann_reports(report_id) ON DELETE CASCADE,
+  asset TEXT NOT NULL,
+  seq INTEGER NOT NULL,
+  start_date DATE NOT NULL,
+  end_date DATE NOT NULL,
+  probability REAL,
+  direction TEXT,                       -- "up" / "down" / NULL
+  description TEXT,
+  PRIMARY KEY (report_id, asset, seq)
+);
+
+CREATE TABLE IF NOT EXISTS gann_levels (
+  report_id TEXT REFERENCES gann_reports(report_id) ON DELETE CASCADE,
+  asset TEXT NOT NULL,
+  kind TEXT NOT NULL,                   -- "support" / "resistance"
+  seq INTEGER NOT NULL,
+  level TEXT,
+  level_low DOUBLE PRECISION,
+  level_high DOUBLE PRECISION,
+  description TEXT,
+  PRIMARY KEY (report_id, asset, kind, seq)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gann_key_dates_start ON gann_key_dates(start_date);
+CREATE INDEX IF NOT EXISTS idx_gann_statistics_start ON gann_statistics(start_date);
+CREATE INDEX IF NOT EXISTS idx_gann_levels_asset ON gann_levels(asset);
+"""
+
+CHILD_TABLES = ["gann_report_assets", "gann_key_dates", "gann_statistics", "gann_levels"]
+
+
+def collect_report(report_dir, root=archive.REPORTS_DIR, content_hash=None):
+    """Flatten one report folder into per-table row tuples (`content_hash` if already computed)."""
+    rid = archive.report_id(report_dir, root)
+    meta = archive.read_json(report_dir / "metadata.json") or {}
+    summary = archive.read_json(report_dir / "summary.json")
+
+    rows = {
+        "gann_reports": [(
+            rid, meta.get("title"), meta.get("url"), meta.get("images"),
+            Json(meta.get("sections", {})), Json(summary) if summary is not None else None,
+            content_hash or archive.content_hash(report_dir),
+        )],
+        "gann_report_assets": [],
+        "gann_key_dates": [],
+        "gann_statistics": [],
+        "gann_levels": [],
+    }
+
+    for asset in archive.report_assets(report_dir):
+        analysis = archive.load_analysis(report_dir, asset)
+        rows["gann_report_assets"].append((
+            rid, asset, analysis.get("asset"), analysis.get("seasonal"), analysis.get("summary"),
+            analysis.get("previous_month_review"),
+            Json(analysis.get("insights", [])), Json(analysis.get("risk_notes", [])),
+        ))
+        for seq, kd in enumerate(archive.key_dates(analysis)):
+            rows["gann_key_dates"].append((rid, asset, seq, kd["start"], kd["end"], kd["description"]))
+        for seq, st in enumerate(archive.statistics(analysis)):
+            rows["gann_statistics"].append((
+                rid, asset, seq, st["start"], st["end"], st["probability"], st["direction"],
+                st["description"],
+            ))
+        seqs = {"support": 0, "resistance": 0}
+        for lv in archive.levels(analysis):
+            rows["gann_levels"].append((
+                rid, asset, lv["kind"], seqs[lv["kind"]], lv["level"], lv["low"], lv["high"],
+                lv["description"],
+            ))
+            seqs[lv["kind"]] += 1
+
+    return rows
+
+
+INSERTS = {
+    "gann_reports": """
+        INSERT INTO gann_reports (report_id, title, url, images, sections, summary, content_hash)
+        VALUES %s
+        ON CONFLICT (report_id) DO UPDATE SET
+          title = EXCLUDED.title, url = EXCLUDED.url, images = EXCLUDED.images,
+          sections = EXCLUDED.sections, summary = EXCLUDED.summary,
+          content_hash = EXCLUDED.content_hash, exported_at = NOW()
+    """,
+    "gann_report_assets": """
+        INSERT INTO gann_report_assets (report_id, asset, asset_name, seasonal, summary,
+                                        previous_month_review, insights, risk_notes)
+        VALUES %s
+    """,
+    "gann_key_dates": """
+        INSERT INTO gann_key_dates (report_id, asset, seq, start_date, end_date, description)
+        VALUES %s
+    """,
+    "gann_statistics": """
+        INSERT INTO gann_statistics (report_id, asset, seq, start_date, end_date, probability,
+                                     direction, description)
+        VALUES %s
+    """,
+    "gann_levels": """
+        INSERT INTO gann_levels (report_id, asset, kind, seq, level, level_low, level_high,
+                                 description)
+        VALUES %s
+    """,
+}
+
+
+def stored_hashes(cur):
+    """Return {report_id: content_hash} for everything already exported."""
+    cur.execute("SELECT report_id, content_hash FROM gann_reports")
+    return dict(cur.fetchall())
+
+
+def export(conn, root=archive.REPORTS_DIR, force=False, dry_run=False):
+    """
+    Export every changed report in one transaction.
+    Returns the list of report ids that were (or would be) written.
+    """
+    with conn.cursor() as cur:
+        stored = stored_hashes(cur)
+    known = {} if force else stored
+
+    changed, present = [], set()
+    batch = {table: [] for table in INSERTS}
+    for report_dir in archive.iter_reports(root):
+        rid = archive.report_id(report_dir, root)
+        present.add(rid)
+        digest = archive.content_hash(report_dir)
+        if known.get(rid) == digest:
+            print(f"  Skip {rid} (unchanged)")
+            continue
+        rows = collect_report(report_dir, root, digest)
+        for table, table_rows in rows.items():
+            batch[table].extend(table_rows)
+        changed.append(rid)
+        print(f"  {rid}: {len(rows['gann_key_dates'])} key dates, "
+              f"{len(rows['gann_statistics'])} statistics, {len(rows['gann_levels'])} levels")
+    removed = sorted(set(stored) - present)
+    for rid in removed:
+        print(f"  {rid}: removed from the archive")
+
+    if not (changed or removed) or dry_run:
+        return changed
+
+    # Child rows are replaced wholesale so shrinking lists never leave stale rows
+    with conn:
+        with conn.cursor() as cur:
+            if removed:
+                # Child rows go with them (ON DELETE CASCADE)
+                cur.execute("DELETE FROM gann_reports WHERE report_id = ANY(%s)", (removed,))
+            if batch["gann_reports"]:
+                execute_values(cur, INSERTS["gann_reports"], batch["gann_reports"], page_size=BATCH_SIZE)
+            for table in CHILD_TABLES:
+                cur.execute(f"DELETE FROM {table} WHERE report_id = ANY(%s)", (changed,))
+                if batch[table]:
+                    execute_values(cur, INSERTS[table], batch[table], page_size=BATCH_SIZE)
+
+    return changed
+
+
+def run(dsn, init_schema=False, force=False, dry_run=False):
+    conn = psycopg2.connect(dsn)
+    try:
+        if init_schema:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(SCHEMA)
+            print("Schema ready")
+
+        started = datetime.now(timezone.utc)
+        changed = export(conn, force=force, dry_run=dry_run)
+        elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+        verb = "Would export" if dry_run else "Exported"
+        print(f"\n{verb} {len(changed)} report(s) in {elapsed:.2f}s")
+        print(json.dumps(changed, ensure_ascii=False))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export report analysis to Postgres/Supabase")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"),
+                        help="Postgres connection string (default: $DATABASE_URL)")
+    parser.add_argument("--init-schema", action="store_true", help="Create tables if missing")
+    parser.add_argument("--force", action="store_true", help="Re-export reports even if unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be exported")
+    args = parser.parse_args()
+
+    if not args.dsn:
+        parser.error("no connection string: pass --dsn or set DATABASE_URL in .env")
+    run(args.dsn, init_schema=args.init_schema, force=args.force, dry_run=args.dry_run)
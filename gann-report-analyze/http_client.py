@@ -0,0 +1,262 @@
+"""
+Cycles Trading Course - Browserless HTTP Client
+Everything after login is plain HTTP, so this client does the same work as
+the Playwright path with a pooled keep-alive requests.Session: WordPress
+login POST (or cookies imported from a saved Playwright session), report
+listing, report page parsing and image download.
+
+download_report.py uses it for `--mode http` and tries it first for
+`--mode auto`, falling back to Chromium when login or parsing fails.
+"""
+
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SITE = "https://cyclestrading-course.com/"
+LOGIN_URL = urljoin(SITE, "wp-login.php")
+USER_AGENT = ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/122.0 Safari/537.36")
+TITLE_SUFFIX = " – סייקלס טריידינג"
+
+# Same filters as the browser-side fallback in detect_asset_sections()
+SKIP_SRC = ["data:", "svg", "logo", "avatar", "gravatar", "emoji", "icon", "smilies"]
+SIZE_SUFFIX_RE = re.compile(r"-\d+x\d+\.")
+
+VOID_TAGS = {"img", "input", "br", "hr", "meta", "link", "source", "wbr", "area", "col", "embed", "param",
+             "track", "base"}
+# Start tags that end an open <p> (HTML's implied </p>)
+CLOSES_P = {"address", "article", "aside", "blockquote", "div", "dl", "fieldset", "figcaption", "figure",
+            "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "main", "nav", "ol", "p",
+            "pre", "section", "table", "ul"}
+
+
+class LoginError(Exception):
+    pass
+
+
+def full_size(src):
+    return SIZE_SUFFIX_RE.sub(".", src, count=1)
+
+
+class ReportPageParser(HTMLParser):
+    """
+    Rebuild detect_asset_sections() items from raw HTML: direct FIGURE/H2
+    children of `.entry-content.single-content`, plus every content <img>
+    and <h2> for the broader fallback.
+
+    Open elements are tracked as a stack with the browser's implied closes
+    (a block start ends an open <p>, a stray end tag is ignored), so an
+    unclosed <p> doesn't shift which elements count as direct children.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.protected = None
+        self.items = []
+        self.all_imgs = []
+        self.all_h2 = []
+        self._in_title = False
+        self._ld_alert = False
+        self._stack = []
+        self._content_depth = None   # stack size with the content div open
+        self._figure_img = None
+        self._h2 = None
+        self._h2_depth = None
+        self._all_h2 = None
+        self._img_idx = 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get("class") or "").split())
+        if tag == "title":
+            self._in_title = True
+        if tag in ("form", "input") and (
+                "post-password-form" in classes or attrs.get("name") == "post_password"):
+            self.protected = self.protected or "PASSWORD_FORM"
+        if "post-password-required" in classes:
+            self.protected = self.protected or "PASSWORD_REQUIRED"
+        if "ld-alert-warning" in classes:
+            self._ld_alert = True
+
+        if tag in VOID_TAGS:
+            if tag == "img" and self._content_depth is not None:
+                self._handle_img(attrs)
+            return
+
+        if tag in CLOSES_P and "p" in self._stack[self._content_depth or 0:]:
+            self._close_to("p")
+        self._stack.append(tag)
+        if self._content_depth is None:
+            if tag == "div" and {"entry-content", "single-content"} <= classes:
+                self._content_depth = len(self._stack)
+            return
+        if tag == "h2":
+            self._all_h2 = []
+        if len(self._stack) == self._content_depth + 1:
+            if tag == "figure":
+                self._figure_img = None
+            elif tag == "h2":
+                self._h2 = []
+
+    def _handle_img(self, attrs):
+        src = attrs.get("src") or attrs.get("data-src") or attrs.get("data-lazy-src") or ""
+        orig = attrs.get("data-orig-file")
+        if src.startswith("data:") and (attrs.get("data-src") or attrs.get("data-lazy-src")):
+            src = attrs.get("data-src") or attrs.get("data-lazy-src")
+        if src and not any(s in src for s in SKIP_SRC):
+            self.all_imgs.append(orig or full_size(src))
+        in_figure = self._content_depth is not None and self._stack[self._content_depth:][:1] == ["figure"]
+        if in_figure and self._figure_img is None and src and "svg" not in src:
+            self._figure_img = full_size(src)
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        if tag in VOID_TAGS or tag not in self._stack:
+            return
+        self._close_to(tag)
+
+    def _close_to(self, tag):
+        """Pop open elements down to and including the innermost `tag`."""
+        while self._stack:
+            closing = self._stack.pop()
+            depth = len(self._stack) + 1
+            if self._content_depth is not None and closing == "h2" and self._all_h2 is not None:
+                self.all_h2.append("".join(self._all_h2).strip())
+                self._all_h2 = None
+            if self._content_depth is not None and depth == self._content_depth + 1:
+                if closing == "figure":
+                    if self._figure_img:
+                        self.items.append({"type": "img", "idx": self._img_idx, "src": self._figure_img})
+                        self._img_idx += 1
+                    self._figure_img = None
+                elif closing == "h2" and self._h2 is not None:
+                    self.items.append({"type": "h2", "text": "".join(self._h2).strip(),
+                                       "afterImg": self._img_idx - 1})
+                    self._h2 = None
+            if self._content_depth is not None and depth == self._content_depth:
+                self._content_depth = None
+            if closing == tag:
+                return
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        if self._ld_alert and "מוגן" in data:
+            self.protected = self.protected or "LEARNDASH_GROUP_PROTECTED"
+        if self._h2 is not None:
+            self._h2.append(data)
+        if self._all_h2 is not None:
+            self._all_h2.append(data)
+
+    def result(self):
+        """Items like detect_asset_sections(), using the broad image list if no FIGUREs matched."""
+        if any(i["type"] == "img" for i in self.items):
+            return self.items
+        seen, items = set(), []
+        for src in self.all_imgs:
+            if src not in seen:
+                seen.add(src)
+                items.append({"type": "img", "idx": len(items), "src": src})
+        # Like the browser fallback: headings follow all images
+        items += [{"type": "h2", "text": text, "afterImg": len(items) - 1} for text in self.all_h2]
+        return items
+
+
+class LinkParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._href = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            self._href = dict(attrs).get("href")
+            self._text = []
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._href is not None:
+            self.links.append({"url": self._href, "title": " ".join("".join(self._text).split())})
+            self._href = None
+
+
+class SiteClient:
+    """Pooled keep-alive session against the course site."""
+
+    def __init__(self, pool_size=8, timeout=30):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.timeout = timeout
+        self.url = None  # last report opened, sent as Referer like the browser's page.url
+
+    def close(self):
+        self.session.close()
+
+    @property
+    def logged_in(self):
+        return any(c.name.startswith("wordpress_logged_in") for c in self.session.cookies)
+
+    def import_session(self, path):
+        """Load cookies from a Playwright storage_state JSON (page.context.storage_state(path=...))."""
+        state = json.loads(Path(path).read_text())
+        for c in state.get("cookies", []):
+            self.session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+        return self.logged_in
+
+    def login(self, email, password):
+        """Direct WordPress login POST. Raises LoginError if no auth cookie is issued."""
+        # wp-login.php refuses the POST unless its test cookie was set first
+        self.session.get(LOGIN_URL, timeout=self.timeout)
+        self.session.cookies.set("wordpress_test_cookie", "WP Cookie check")
+        resp = self.session.post(LOGIN_URL, timeout=self.timeout, data={
+            "log": email, "pwd": password, "rememberme": "forever",
+            "wp-submit": "Log In", "redirect_to": SITE, "testcookie": "1",
+        })
+        if not self.logged_in:
+            raise LoginError(f"WordPress login failed (HTTP {resp.status_code})")
+        print("Login successful! (HTTP)")
+
+    def get_text(self, url):
+        resp = self.session.get(url, timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.text
+
+    def list_links(self, year):
+        """Links on the home page whose href contains `year` (same as the browser locator)."""
+        parser = LinkParser()
+        parser.feed(self.get_text(SITE))
+        links = [link for link in parser.links if link["url"] and year in link["url"]]
+        return [{"index": i, **link} for i, link in enumerate(links)]
+
+    def open_report(self, url):
+        """Fetch a report page. Returns (title, items, protection) like the browser path."""
+        parser = ReportPageParser()
+        parser.feed(self.get_text(url))
+        title = parser.title.replace(TITLE_SUFFIX, "").strip()
+        self.url = url
+        return title, parser.result(), parser.protected
+
+    def fetch_bytes(self, url, referer=None):
+        """
+        Image bytes, or None on an HTTP error or an HTML page in place of the image.
+        Hotlink protection wants the report page as `referer`.
+        """
+        resp = self.session.get(url, timeout=self.timeout, headers={"Referer": referer} if referer else None)
+        if not resp.ok or resp.headers.get("Content-Type", "").startswith("text/html"):
+            return None
+        return resp.content
@@ -0,0 +1,333 @@
+"""
+Cycles Trading Course - Daily Price Store
+Daily OHLC bars for the report assets (sp500, bitcoin, eurusd, gold, oil),
+kept as one raw column file per field under prices/<asset>/ and opened with
+np.memmap, so loading years of history costs a few syscalls, not a parse.
+
+  prices/gold/day.bin      int32 days since 1970-01-01, ascending
+  prices/gold/open.bin     float64 (same for high, low, close, volume)
+  prices/gold/meta.json    {"rows": N, "generation": G, "source": ...}
+
+Appending newer bars writes to the end of each column and then commits the
+new row count to meta.json, so readers never see a half-written bar.
+Imports that overlap or predate existing history rewrite the columns into a
+new generation (day.G.bin, close.G.bin, ...) that meta.json switches to only
+once every column is complete, so readers see either the old set or the new one.
+"""
+
+import csv
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import archive
+
+PRICES_DIR = Path(__file__).parent / "prices"
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+DAY_DTYPE = np.int32
+VALUE_DTYPE = np.float64
+
+# CSV header aliases (Yahoo, Stooq, TradingView, investing.com exports)
+HEADER_ALIASES = {
+    "date": "day", "time": "day", "timestamp": "day", "datetime": "day",
+    "open": "open", "high": "high", "low": "low",
+    "close": "close", "price": "close", "last": "close", "adj close": "adj_close",
+    "volume": "volume", "vol.": "volume", "vol": "volume",
+}
+DATE_FORMATS = ["%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%d.%m.%Y", "%Y%m%d"]
+
+
+def to_day(value):
+    """'2026-03-19' (or a date/datetime, or unix seconds) -> int days since epoch."""
+    if isinstance(value, (int, np.integer)):
+        return int(value) // 86400 if value > 10 ** 6 else int(value)
+    if hasattr(value, "toordinal"):
+        return value.toordinal() - 719163
+    text = str(value).strip()
+    if text.isdigit() and len(text) >= 9:
+        return int(text) // 86400
+    head = text.split("T")[0].split(" ")[0]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(head, fmt).toordinal() - 719163
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date: {value!r}")
+
+
+def day_str(day):
+    return str(np.datetime64(int(day), "D"))
+
+
+def _number(text):
+    text = (text or "").strip().replace(",", "")
+    if text in ("", "null", "-", "nan"):
+        return np.nan
+    mult = 1.0
+    if text[-1:] in ("K", "M", "B"):
+        mult = {"K": 1e3, "M": 1e6, "B": 1e9}[text[-1]]
+        text = text[:-1]
+    return float(text) * mult
+
+
+def read_csv(path):
+    """Parse an OHLC CSV into (days, {field: values}) sorted by day, last row per day winning."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [HEADER_ALIASES.get(h.strip().lower().strip("<>"), h.strip().lower())
+                  for h in next(reader)]
+        if "day" not in header or "close" not in header:
+            raise ValueError(f"{path}: need at least date and close columns, got {header}")
+        col = {name: i for i, name in enumerate(header)}
+        rows = {}
+        for row in reader:
+            if not row or not row[col["day"]].strip():
+                continue
+            day = to_day(row[col["day"]])
+            rows[day] = [_number(row[col[f]]) if f in col and col[f] < len(row) else np.nan
+                         for f in FIELDS]
+
+    days = np.array(sorted(rows), dtype=DAY_DTYPE)
+    values = np.array([rows[d] for d in days.tolist()], dtype=VALUE_DTYPE).reshape(-1, len(FIELDS))
+    columns = {f: values[:, i].copy() for i, f in enumerate(FIELDS)}
+    # Close-only files (some FX exports): use close for the missing OHLC fields
+    for f in ("open", "high", "low"):
+        missing = np.isnan(columns[f])
+        columns[f][missing] = columns["close"][missing]
+    return days, columns
+
+
+def column_path(folder, name, generation=0):
+    """Column file of a generation; generation 0 keeps the original day.bin names."""
+    return folder / (f"{name}.{generation}.bin" if generation else f"{name}.bin")
+
+
+class Series:
+    """Memory-mapped columns of one asset. Arrays are read-only views."""
+
+    def __init__(self, folder, rows, generation=0):
+        self.folder = folder
+        self.rows = rows
+        self.generation = generation
+        self.day = self._map("day", DAY_DTYPE)
+        self.columns = {f: self._map(f, VALUE_DTYPE) for f in FIELDS}
+
+    def _map(self, name, dtype):
+        if self.rows == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(column_path(self.folder, name, self.generation), dtype=dtype, mode="r",
+                         shape=(self.rows,))
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, field):
+        return self.day if field == "day" else self.columns[field]
+
+    def bounds(self, start=None, end=None):
+        """Row range [lo, hi) covering days start..end inclusive (binary search)."""
+        lo = 0 if start is None else int(np.searchsorted(self.day, to_day(start), side="left"))
+        hi = self.rows if end is None else int(np.searchsorted(self.day, to_day(end), side="right"))
+        return lo, hi
+
+    def slice(self, start=None, end=None, fields=FIELDS):
+        """{"day": ..., field: ...} views for days start..end inclusive; no copying."""
+        lo, hi = self.bounds(start, end)
+        out = {"day": self.day[lo:hi]}
+        for f in fields:
+            out[f] = self.columns[f][lo:hi]
+        return out
+
+
+class PriceStore:
+    def __init__(self, root=PRICES_DIR):
+        self.root = Path(root)
+        self._cache = {}
+
+    def folder(self, asset):
+        if asset not in archive.ASSETS:
+            raise ValueError(f"unknown asset {asset!r} (expected one of {archive.ASSETS})")
+        return self.root / asset
+
+    def meta(self, asset):
+        return archive.read_json(self.folder(asset) / "meta.json") or {"rows": 0}
+
+    def assets(self):
+        return [a for a in archive.ASSETS if self.meta(a)["rows"]]
+
+    def series(self, asset):
+        """Open (or reuse) the memmaps for an asset; reopened when meta.json changes."""
+        meta_path = self.folder(asset) / "meta.json"
+        for attempt in range(3):
+            version = archive.file_version(meta_path)
+            cached = self._cache.get(asset)
+            if cached and cached[0] == version:
+                return cached[1]
+            meta = self.meta(asset)
+            try:
+                series = Series(self.folder(asset), meta["rows"], meta.get("generation", 0))
+            except FileNotFoundError:
+                # A rewrite switched generations and removed the old files after we read meta.json
+                if attempt == 2:
+                    raise
+                continue
+            self._cache[asset] = (version, series)
+            return series
+
+    def slice(self, asset, start=None, end=None, fields=FIELDS):
+        return self.series(asset).slice(start, end, fields)
+
+    def write(self, asset, days, columns, source=None):
+        """
+        Add bars to an asset. Bars strictly after the last stored day are appended
+        in place; anything overlapping rewrites the columns (new values win).
+        Returns (appended, rewritten) row counts.
+        """
+        folder = self.folder(asset)
+        folder.mkdir(parents=True, exist_ok=True)
+        with archive.FileLock(folder / "write.lock", timeout=60):
+            meta = self.meta(asset)
+            rows = meta["rows"]
+            generation = meta.get("generation", 0)
+            current = Series(folder, rows, generation)
+            days = np.asarray(days, dtype=DAY_DTYPE)
+            if not len(days):
+                return 0, 0
+
+            if rows == 0 or days[0] > current.day[-1]:
+                for name, dtype, values in self._columns(days, columns):
+                    path = column_path(folder, name, generation)
+                    with open(path, "r+b" if rows else "wb") as f:
+                        # Drop any tail left by an append that never committed
+                        f.truncate(rows * np.dtype(dtype).itemsize)
+                        f.seek(0, os.SEEK_END)
+                        f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                appended, rewritten = len(days), 0
+                total = rows + len(days)
+            else:
+                all_days = np.concatenate([current.day, days])
+                # Stable sort on the reversed order keeps the new bar when a day repeats
+                order = np.argsort(all_days[::-1], kind="stable")
+                merged_days, first = np.unique(all_days[::-1][order], return_index=True)
+                pick = order[first]
+                merged = {f: np.concatenate([current.columns[f], columns[f]])[::-1][pick] for f in FIELDS}
+                del current
+                # New generation: readers keep using the old files until meta.json switches
+                old_generation, generation = generation, generation + 1
+                for name, dtype, values in self._columns(merged_days, merged):
+                    archive.atomic_write(column_path(folder, name, generation),
+                                         np.ascontiguousarray(values, dtype=dtype).tobytes())
+                appended, rewritten = len(merged_days) - rows, len(merged_days)
+                total = len(merged_days)
+
+            stored = np.memmap(column_path(folder, "day", generation), dtype=DAY_DTYPE, mode="r",
+                               shape=(total,))
+            meta.update(rows=total, generation=generation, first=day_str(stored[0]),
+                        last=day_str(stored[-1]))
+            del stored
+            if source:
+                meta["source"] = str(source)
+            archive.write_json(folder / "meta.json", meta)
+            if rewritten:
+                for name, _, _ in self._columns(merged_days, merged):
+                    column_path(folder, name, old_generation).unlink(missing_ok=True)
+        self._cache.pop(asset, None)
+        return appended, rewritten
+
+    @staticmethod
+    def _columns(days, columns):
+        yield "day", DAY_DTYPE, days
+        for f in FIELDS:
+            yield f, VALUE_DTYPE, columns[f]
+
+    def import_csv(self, asset, path):
+        days, columns = read_csv(path)
+        return self.write(asset, days, columns, source=Path(path).name)
+
+    def align(self, assets=None, start=None, end=None, field="close", how="outer", ffill=True):
+        """
+        Put several assets on one calendar. Returns (days, {asset: values}).
+
+        how="outer" uses every day any asset traded (crypto trades weekends,
+        futures don't); how="inner" only days all of them traded. With ffill,
+        gaps take the asset's last known value instead of nan.
+        """
+        assets = assets or self.assets()
+        sliced = {a: self.slice(a, start, end, fields=[field]) for a in assets}
+        calendars = [s["day"] for s in sliced.values()]
+        if not calendars:
+            return np.zeros(0, dtype=DAY_DTYPE), {}
+        if how == "inner":
+            days = calendars[0]
+            for c in calendars[1:]:
+                days = np.intersect1d(days, c, assume_unique=True)
+        else:
+            days = np.unique(np.concatenate(calendars))
+
+        out = {}
+        for asset, s in sliced.items():
+            values = np.full(len(days), np.nan)
+            if len(s["day"]):
+                if ffill:
+                    idx = np.searchsorted(s["day"], days, side="right") - 1
+                    ok = idx >= 0
+                else:
+                    idx = np.searchsorted(s["day"], days, side="left")
+                    ok = idx < len(s["day"])
+                    ok[ok] = s["day"][idx[ok]] == days[ok]
+                values[ok] = s[field][idx[ok]]
+            out[asset] = values
+        return days, out
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Local daily OHLC store for the report assets")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_import = sub.add_parser("import", help="Import CSV bars (date, open, high, low, close, volume)")
+    p_import.add_argument("asset", choices=archive.ASSETS)
+    p_import.add_argument("csv", nargs="+")
+    sub.add_parser("info", help="Rows and date range per asset")
+    p_show = sub.add_parser("show", help="Print bars for a date range")
+    p_show.add_argument("asset", choices=archive.ASSETS)
+    p_show.add_argument("--from", dest="start")
+    p_show.add_argument("--to", dest="end")
+    p_align = sub.add_parser("align", help="Closes of several assets on one calendar (CSV)")
+    p_align.add_argument("--assets", help="Comma-separated (default: all stored)")
+    p_align.add_argument("--from", dest="start")
+    p_align.add_argument("--to", dest="end")
+    p_align.add_argument("--field", choices=FIELDS, default="close")
+    p_align.add_argument("--inner", action="store_true", help="Only days every asset traded")
+    p_align.add_argument("--no-ffill", action="store_true", help="Leave gaps empty")
+    args = parser.parse_args()
+
+    store = PriceStore()
+    if args.cmd == "import":
+        for path in args.csv:
+            appended, rewritten = store.import_csv(args.asset, path)
+            action = f"rewrote {rewritten} rows" if rewritten else f"appended {appended} rows"
+            print(f"  {args.asset} <- {path}: {action}")
+    elif args.cmd == "info":
+        print(json.dumps({a: store.meta(a) for a in store.assets()}, indent=2))
+    elif args.cmd == "show":
+        bars = store.slice(args.asset, args.start, args.end)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["date"] + FIELDS)
+        for i in range(len(bars["day"])):
+            writer.writerow([day_str(bars["day"][i])] + [f"{bars[f][i]:g}" for f in FIELDS])
+    elif args.cmd == "align":
+        assets = args.assets.split(",") if args.assets else None
+        days, values = store.align(assets, args.start, args.end, field=args.field,
+                                   how="inner" if args.inner else "outer", ffill=not args.no_ffill)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["date"] + list(values))
+        for i, day in enumerate(days):
+            writer.writerow([day_str(day)] + ["" if np.isnan(v[i]) else f"{v[i]:g}" for v in values.values()])
@@ -0,0 +1,251 @@
+"""
+Cycles Trading Course - Sentiment History Store
+market_sentiment/sentiment_scraper.js overwrites sentiment_data.json on every
+scrape. This keeps every distinct snapshot instead, as fixed-width arrays
+under sentiment/ opened with np.memmap:
+
+  sentiment/ts.bin        int64 unix seconds of scraped_at, ascending
+  sentiment/long.72.bin   float32 [snapshots x 72 symbols] long %, nan if absent
+  sentiment/short.72.bin  float32 [snapshots x 72 symbols] short %
+  sentiment/meta.json     {"rows": N, "symbols": [...], ...}
+
+A snapshot identical to the last stored one (same values for every symbol)
+is skipped. New symbols widen the matrices into new files named for their
+width; meta.json switches over only once they are complete.
+Windowed queries are searchsorted slices, e.g. the EUR/USD trajectory in the
+days around every key date of the reports.
+"""
+
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+import archive
+
+HERE = Path(__file__).parent
+STORE_DIR = HERE / "sentiment"
+SNAPSHOT_FILES = [HERE.parent / "market_sentiment" / "sentiment_data.json"]
+
+# Report asset -> myfxbook symbols, first match wins (myfxbook only lists FX and metals)
+ASSET_SYMBOLS = {
+    "sp500": ["SPX500", "US500"],
+    "bitcoin": ["BTCUSD"],
+    "eurusd": ["EURUSD"],
+    "gold": ["XAUUSD"],
+    "oil": ["WTIUSD", "XTIUSD", "USOIL"],
+}
+
+DAY = 86400
+
+
+def to_seconds(value):
+    """ISO timestamp ('2026-02-11T18:45:33.366Z'), date string or day number -> unix seconds."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    text = str(value).strip().replace("Z", "+00:00")
+    if len(text) == 10:
+        text += "T00:00:00+00:00"
+    return int(datetime.fromisoformat(text).timestamp())
+
+
+def iso(seconds):
+    return str(np.datetime64(int(seconds), "s")) + "Z"
+
+
+class SentimentStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self._cache = None
+
+    def meta(self):
+        return archive.read_json(self.root / "meta.json") or {"rows": 0, "symbols": []}
+
+    def _matrix(self, name, width):
+        return self.root / f"{name}.{width}.bin"
+
+    def _open(self, meta):
+        """(meta, ts, long, short) memmaps for the committed rows of `meta`."""
+        rows, width = meta["rows"], len(meta["symbols"])
+        if rows == 0:
+            return (meta, np.zeros(0, np.int64), np.zeros((0, width), np.float32),
+                    np.zeros((0, width), np.float32))
+        return (meta,
+                np.memmap(self.root / "ts.bin", np.int64, "r", shape=(rows,)),
+                np.memmap(self._matrix("long", width), np.float32, "r", shape=(rows, width)),
+                np.memmap(self._matrix("short", width), np.float32, "r", shape=(rows, width)))
+
+    def arrays(self):
+        """(meta, ts, long, short); reopened only when meta.json changes."""
+        version = archive.file_version(self.root / "meta.json")
+        if self._cache is None or self._cache[0] != version:
+            self._cache = (version, self._open(self.meta()))
+        return self._cache[1]
+
+    def add(self, snapshot):
+        """
+        Append one scraper snapshot ({scraped_at, data: [{symbol, long_pct, short_pct}]}).
+        Returns True if stored, False if it was older than or identical to the last one.
+        """
+        ts = to_seconds(snapshot["scraped_at"])
+        self.root.mkdir(parents=True, exist_ok=True)
+        with archive.FileLock(self.root / "write.lock", timeout=60):
+            meta = self.meta()
+            symbols = list(meta["symbols"])
+            rows = meta["rows"]
+            _, ts_col, long_m, short_m = self._open(meta)
+            if rows and ts <= ts_col[-1]:
+                return False
+
+            new = [r["symbol"] for r in snapshot["data"] if r["symbol"] not in symbols]
+            long_row = np.full(len(symbols) + len(new), np.nan, np.float32)
+            short_row = long_row.copy()
+            col = {s: i for i, s in enumerate(symbols + new)}
+            for r in snapshot["data"]:
+                long_row[col[r["symbol"]]] = r.get("long_pct", np.nan)
+                short_row[col[r["symbol"]]] = r.get("short_pct", np.nan)
+
+            if rows and not new and np.array_equal(long_m[-1], long_row, equal_nan=True) \
+                    and np.array_equal(short_m[-1], short_row, equal_nan=True):
+                return False
+
+            old_width, width = len(symbols), len(long_row)
+            if new and rows:
+                # Widen history with empty columns for the new symbols
+                pad = np.full((rows, len(new)), np.nan, np.float32)
+                for name, matrix in (("long", long_m), ("short", short_m)):
+                    archive.atomic_write(self._matrix(name, width),
+                                         np.hstack([matrix, pad]).astype(np.float32).tobytes())
+            del ts_col, long_m, short_m
+
+            for path, dtype, values in ((self.root / "ts.bin", np.int64, np.array([ts])),
+                                        (self._matrix("long", width), np.float32, long_row),
+                                        (self._matrix("short", width), np.float32, short_row)):
+                itemsize = np.dtype(dtype).itemsize * (1 if dtype == np.int64 else width)
+                with open(path, "r+b" if path.exists() else "wb") as f:
+                    # Drop any tail left by an append that never committed
+                    f.truncate(rows * itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            meta.update(rows=rows + 1, symbols=symbols + new, last=snapshot["scraped_at"],
+                        source=snapshot.get("source"))
+            meta.setdefault("first", snapshot["scraped_at"])
+            archive.write_json(self.root / "meta.json", meta)
+            if new and rows:
+                for name in ("long", "short"):
+                    self._matrix(name, old_width).unlink(missing_ok=True)
+        self._cache = None
+        return True
+
+    def column(self, symbol):
+        meta = self.arrays()[0]
+        if symbol not in meta["symbols"]:
+            raise KeyError(f"no sentiment history for {symbol}")
+        return meta["symbols"].index(symbol)
+
+    def series(self, symbol, start=None, end=None):
+        """{"ts", "long", "short"} for one symbol between two times (inclusive); views, no copies."""
+        _, ts, long_m, short_m = self.arrays()
+        c = self.column(symbol)
+        lo = 0 if start is None else int(np.searchsorted(ts, to_seconds(start), side="left"))
+        if end is not None:
+            # A bare date means the whole day
+            end = to_seconds(end) + (DAY - 1 if len(str(end)) == 10 else 0)
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+        return {"ts": ts[lo:hi], "long": long_m[lo:hi, c], "short": short_m[lo:hi, c]}
+
+    def windows(self, symbol, days, before=2, after=2):
+        """
+        Snapshots of `symbol` in [day - before, day + after] (whole UTC days) for
+        every day in `days` (int days since epoch). Bounds for all windows come
+        from two searchsorted calls. Returns a list of (ts, long, short) views.
+        """
+        _, ts, long_m, short_m = self.arrays()
+        c = self.column(symbol)
+        days = np.asarray(days, dtype=np.int64)
+        lo = np.searchsorted(ts, (days - before) * DAY, side="left")
+        hi = np.searchsorted(ts, (days + after + 1) * DAY, side="left")
+        return [(ts[a:b], long_m[a:b, c], short_m[a:b, c]) for a, b in zip(lo, hi)]
+
+
+def symbol_for(store, asset):
+    """First myfxbook symbol of a report asset that has history, or None."""
+    symbols = store.arrays()[0]["symbols"]
+    return next((s for s in ASSET_SYMBOLS.get(asset, []) if s in symbols), None)
+
+
+def around_key_dates(store, asset, before=2, after=2, root=archive.REPORTS_DIR):
+    """Sentiment trajectory around every key date of `asset` across the archive."""
+    symbol = symbol_for(store, asset)
+    if symbol is None:
+        return []
+    events = []
+    for report_dir in archive.iter_reports(root):
+        for row in archive.key_dates(archive.load_analysis(report_dir, asset)):
+            events.append((archive.report_id(report_dir, root), row["start"], row["description"]))
+    days = [(d - datetime(1970, 1, 1).date()).days for _, d, _ in events]
+
+    out = []
+    for (rid, day, description), (ts, long, short) in zip(events, store.windows(symbol, days, before, after)):
+        if not len(ts):
+            continue
+        out.append({
+            "report": rid, "date": day.isoformat(), "symbol": symbol, "description": description,
+            "points": [[iso(t), float(l), float(s)] for t, l, s in zip(ts, long, short)],
+            "long_change": float(long[-1] - long[0]),
+        })
+    return out
+
+
+def ingest(paths, store=None):
+    """Add each snapshot file in order of scraped_at. Returns (stored, skipped)."""
+    store = store or SentimentStore()
+    snapshots = [s for s in (archive.read_json(p) for p in paths) if s and s.get("data")]
+    stored = skipped = 0
+    for snapshot in sorted(snapshots, key=lambda s: to_seconds(s["scraped_at"])):
+        if store.add(snapshot):
+            stored += 1
+        else:
+            skipped += 1
+    return stored, skipped
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Append-only myfxbook sentiment history")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_ingest = sub.add_parser("ingest", help="Append sentiment_data.json snapshot(s)")
+    p_ingest.add_argument("files", nargs="*", default=[str(p) for p in SNAPSHOT_FILES])
+    sub.add_parser("info", help="Snapshot count, symbols and time range")
+    p_show = sub.add_parser("show", help="History of one symbol")
+    p_show.add_argument("symbol")
+    p_show.add_argument("--from", dest="start")
+    p_show.add_argument("--to", dest="end")
+    p_around = sub.add_parser("around", help="Sentiment around each report key date of an asset")
+    p_around.add_argument("asset", choices=list(ASSET_SYMBOLS))
+    p_around.add_argument("--before", type=int, default=2, help="Days before the key date")
+    p_around.add_argument("--after", type=int, default=2, help="Days after the key date")
+    args = parser.parse_args()
+
+    store = SentimentStore()
+    if args.cmd == "ingest":
+        stored, skipped = ingest(args.files, store)
+        print(f"Stored {stored} snapshot(s), skipped {skipped} unchanged/old; "
+              f"{store.meta()['rows']} in history")
+    elif args.cmd == "info":
+        meta = store.meta()
+        print(json.dumps({k: meta.get(k) for k in ("rows", "first", "last", "source")} |
+                         {"symbols": len(meta["symbols"])}, indent=2))
+    elif args.cmd == "show":
+        s = store.series(args.symbol.upper(), args.start, args.end)
+        for t, l, sh in zip(s["ts"], s["long"], s["short"]):
+            print(f"{iso(t)}  long {l:5.1f}  short {sh:5.1f}")
+    elif args.cmd == "around":
+        print(json.dumps(around_key_dates(store, args.asset, args.before, args.after),
+                         indent=2, ensure_ascii=False))
@@ -0,0 +1,335 @@
+"""
+Cycles Trading Course - Slide Similarity Search
+Finds archived chart slides that look like a given one ("which months had a
+gold seasonal chart like this?").
+
+Every image under reports/ is reduced to a small feature vector (grayscale
+thumbnail, edge-density grid, coarse colour histogram) and stored as one row
+of a float32 matrix in similarity.npz (beside this script, outside the
+archive that gets synced and bundled). At load time the matrix is
+centred on the archive mean (slides share a white page and banner, which
+would otherwise dominate) and L2-normalized, so a query is a single
+matrix-vector product followed by a top-k partition.
+Building is incremental: only new or changed images are decoded.
+
+Slide type is a layout cluster (k-means over the edge grid), so charts,
+text pages, date timelines and covers land in different types without
+needing labels.
+"""
+
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+import archive
+
+INDEX_PATH = Path(__file__).parent / "similarity.npz"
+
+# Slides are portrait (1414x2000); keep that aspect in the grids
+THUMB_SIZE = (16, 24)
+EDGE_GRID = (8, 12)
+COLOR_BINS = 4
+# Relative weight of each block in the cosine score
+WEIGHTS = {"thumb": 1.0, "edges": 1.0, "color": 0.5}
+SLIDE_TYPES = 8
+
+SECTIONS = ["cover"] + archive.ASSETS + ["review", "other"]
+
+
+def _unit(v):
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def image_features(data):
+    """Feature vector for one image's bytes: thumbnail, edge grid and colour histogram blocks."""
+    with Image.open(io.BytesIO(data)) as im:
+        im.draft("RGB", (THUMB_SIZE[0] * 16, THUMB_SIZE[1] * 16))
+        rgb = im.convert("RGB").resize((THUMB_SIZE[0] * 8, THUMB_SIZE[1] * 8), Image.BILINEAR)
+
+    gray = rgb.convert("L")
+    thumb = np.asarray(gray.resize(THUMB_SIZE, Image.BOX), dtype=np.float32).ravel()
+    thumb -= thumb.mean()
+
+    # Text, charts and timelines differ mostly in where the fine detail is
+    edges = np.asarray(gray.filter(ImageFilter.FIND_EDGES), dtype=np.float32)
+    gx, gy = EDGE_GRID
+    h, w = edges.shape
+    grid = edges[:h - h % gy, :w - w % gx].reshape(gy, h // gy, gx, w // gx).mean(axis=(1, 3)).ravel()
+
+    pixels = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3) // (256 // COLOR_BINS)
+    bins = (pixels[:, 0].astype(np.int32) * COLOR_BINS + pixels[:, 1]) * COLOR_BINS + pixels[:, 2]
+    color = np.sqrt(np.bincount(bins, minlength=COLOR_BINS ** 3).astype(np.float32))
+
+    vec = np.concatenate([WEIGHTS["thumb"] * _unit(thumb), WEIGHTS["edges"] * _unit(grid),
+                          WEIGHTS["color"] * _unit(color)])
+    return _unit(vec).astype(np.float32)
+
+
+def edge_block(features):
+    """The edge-grid columns of a feature matrix (used for slide types)."""
+    start = THUMB_SIZE[0] * THUMB_SIZE[1]
+    return features[:, start:start + EDGE_GRID[0] * EDGE_GRID[1]]
+
+
+def _features_job(path):
+    """Worker: (path, vector or None, error)."""
+    try:
+        return path, image_features(archive.read_bytes(path)), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def kmeans(x, k, iters=25, seed=0):
+    """Plain Lloyd's k-means; returns (labels, centroids). Deterministic for a given seed."""
+    if len(x) == 0:
+        return np.zeros(0, dtype=np.int16), np.zeros((0, x.shape[1]), dtype=np.float32)
+    k = min(k, len(x))
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), size=k, replace=False)]
+    for _ in range(iters):
+        d = (x ** 2).sum(1)[:, None] - 2 * x @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        labels = d.argmin(1)
+        moved = np.array([x[labels == c].mean(0) if np.any(labels == c) else centroids[c]
+                          for c in range(k)], dtype=np.float32)
+        if np.allclose(moved, centroids):
+            break
+        centroids = moved
+    # Number types by size so type 0 is the most common layout
+    order = np.argsort(-np.bincount(labels, minlength=k), kind="stable")
+    rank = np.empty(k, dtype=np.int16)
+    rank[order] = np.arange(k)
+    return rank[labels], centroids[order]
+
+
+class SimilarityIndex:
+    """Feature matrix plus per-row metadata; rows align across all arrays."""
+
+    def __init__(self, features, paths, versions, reports, sections, types, centroids=None):
+        self.features = features
+        self.paths = paths
+        self.versions = versions
+        self.reports = reports
+        self.sections = sections
+        self.types = types
+        self.centroids = centroids if centroids is not None else np.zeros((0, 0), dtype=np.float32)
+        self.row = {p: i for i, p in enumerate(paths)}
+        self.mean = features.mean(0) if len(features) else np.zeros(features.shape[1], np.float32)
+        self.matrix = self.normalize(features)
+
+    def __len__(self):
+        return len(self.paths)
+
+    @classmethod
+    def empty(cls):
+        dim = THUMB_SIZE[0] * THUMB_SIZE[1] + EDGE_GRID[0] * EDGE_GRID[1] + COLOR_BINS ** 3
+        return cls(np.zeros((0, dim), dtype=np.float32), [], np.zeros((0, 2), dtype=np.int64),
+                   [], [], np.zeros(0, dtype=np.int16))
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        if not Path(path).exists():
+            return cls.empty()
+        with np.load(path, allow_pickle=False) as z:
+            return cls(z["features"], z["paths"].tolist(), z["versions"], z["reports"].tolist(),
+                       z["sections"].tolist(), z["types"], z["centroids"])
+
+    def save(self, path=INDEX_PATH):
+        path = Path(path)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp, features=self.features, paths=np.array(self.paths, dtype=str),
+                 versions=self.versions, reports=np.array(self.reports, dtype=str),
+                 sections=np.array(self.sections, dtype=str), types=self.types,
+                 centroids=self.centroids)
+        os.replace(tmp, path)
+
+    def normalize(self, vectors):
+        """Centre raw feature rows on the archive mean and scale them to unit length."""
+        centred = vectors - self.mean
+        norms = np.linalg.norm(centred, axis=1, keepdims=True)
+        return centred / np.where(norms == 0, 1, norms)
+
+    def slide_type(self, vector):
+        """Nearest layout cluster for a feature vector that isn't in the index."""
+        if not len(self.centroids):
+            return -1
+        block = edge_block(vector[None, :])[0]
+        return int(((self.centroids - block) ** 2).sum(1).argmin())
+
+    def mask(self, section=None, slide_type=None, exclude_report=None):
+        keep = np.ones(len(self.paths), dtype=bool)
+        if section:
+            keep &= np.array(self.sections) == section
+        if slide_type is not None:
+            keep &= self.types == slide_type
+        if exclude_report:
+            keep &= np.array(self.reports) != exclude_report
+        return keep
+
+    def search(self, vector, k=10, section=None, slide_type=None, exclude_report=None,
+               per_report=None):
+        """
+        Top-k rows by cosine similarity to `vector`, as dicts (best first).
+        `per_report` caps hits per report, e.g. 1 for "one slide per month".
+        """
+        return self.search_batch(vector[None, :], k, section, slide_type, exclude_report,
+                                 per_report)[0]
+
+    def search_batch(self, vectors, k=10, section=None, slide_type=None, exclude_report=None,
+                     per_report=None):
+        """search() for a (q, dim) matrix of raw query features, scored in one matmul."""
+        keep = np.flatnonzero(self.mask(section, slide_type, exclude_report))
+        if not len(keep):
+            return [[] for _ in vectors]
+        scores = self.normalize(vectors) @ self.matrix[keep].T          # (q, candidates)
+        # Over-fetch when capping per report, then trim after grouping
+        want = min(len(keep), k * 8 if per_report else k)
+        top = np.argpartition(-scores, want - 1, axis=1)[:, :want]
+        results = []
+        for q in range(len(vectors)):
+            order = top[q][np.argsort(-scores[q, top[q]], kind="stable")]
+            hits, counts = [], {}
+            for j in order:
+                i = keep[j]
+                report = self.reports[i]
+                if per_report and counts.get(report, 0) >= per_report:
+                    continue
+                counts[report] = counts.get(report, 0) + 1
+                hits.append({"path": self.paths[i], "report": report, "section": self.sections[i],
+                             "type": int(self.types[i]), "score": round(float(scores[q, j]), 4)})
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+
+def scan_archive(root=archive.REPORTS_DIR):
+    """{relative path: (version, report id, section)} for every image in the archive."""
+    images = {}
+    for report_dir in archive.iter_reports(root):
+        rid = archive.report_id(report_dir, root)
+        for path in archive.iter_images(report_dir):
+            rel = path.relative_to(root).as_posix()
+            images[rel] = (archive.file_version(path), rid, path.parent.name)
+    return images
+
+
+def build(root=archive.REPORTS_DIR, index_path=INDEX_PATH, workers=None, rebuild=False,
+          types=SLIDE_TYPES):
+    """Bring the index up to date with the archive. Returns (index, stats)."""
+    root = Path(root)
+    old = SimilarityIndex.empty() if rebuild else SimilarityIndex.load(index_path)
+    images = scan_archive(root)
+
+    reuse, todo = [], []
+    for rel, (version, _, _) in sorted(images.items()):
+        i = old.row.get(rel)
+        if i is not None and tuple(old.versions[i]) == tuple(version):
+            reuse.append((rel, i))
+        else:
+            todo.append(rel)
+
+    fresh, failed = {}, []
+    if todo:
+        jobs = [str(root / rel) for rel in todo]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path, vector, error in pool.map(_features_job, jobs, chunksize=8):
+                rel = Path(path).relative_to(root).as_posix()
+                if vector is None:
+                    failed.append({"path": rel, "error": error})
+                else:
+                    fresh[rel] = vector
+
+    paths = [rel for rel, _ in reuse] + [rel for rel in todo if rel in fresh]
+    features = np.empty((len(paths), old.features.shape[1]), dtype=np.float32)
+    if reuse:
+        features[:len(reuse)] = old.features[[i for _, i in reuse]]
+    for n, rel in enumerate(paths[len(reuse):], start=len(reuse)):
+        features[n] = fresh[rel]
+
+    # Layout clusters are recomputed only when rows changed
+    if todo or len(paths) != len(old) or not len(old.centroids):
+        labels, centroids = kmeans(edge_block(features), types)
+    else:
+        labels, centroids = old.types[[i for _, i in reuse]], old.centroids
+
+    index = SimilarityIndex(
+        features, paths, np.array([images[p][0] for p in paths], dtype=np.int64).reshape(-1, 2),
+        [images[p][1] for p in paths], [images[p][2] for p in paths], labels.astype(np.int16),
+        centroids)
+    if todo or len(paths) != len(old):
+        index.save(index_path)
+    stats = {"images": len(paths), "added": len(fresh), "reused": len(reuse),
+             "removed": len(set(old.paths) - set(images)), "failed": failed}
+    return index, stats
+
+
+def query_vector(index, image, root=archive.REPORTS_DIR):
+    """(vector, report id, slide type) for an archive path or any image file."""
+    path = Path(image)
+    try:
+        rel = path.resolve().relative_to(Path(root).resolve()).as_posix()
+    except ValueError:
+        rel = path.as_posix()
+    i = index.row.get(rel)
+    if i is not None:
+        return index.features[i], index.reports[i], int(index.types[i])
+    vector = image_features(archive.read_bytes(path))
+    return vector, None, index.slide_type(vector)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Visual similarity search over report slides")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build", help="Index new/changed images")
+    p_build.add_argument("--workers", type=int, default=os.cpu_count())
+    p_build.add_argument("--rebuild", action="store_true", help="Recompute every image")
+    p_build.add_argument("--types", type=int, default=SLIDE_TYPES, help="Number of slide types")
+    p_query = sub.add_parser("query", help="Find slides like an image")
+    p_query.add_argument("image", help="reports/2026/03/gold/40.png or any image file")
+    p_query.add_argument("-k", type=int, default=10)
+    p_query.add_argument("--section", choices=SECTIONS, help="Only this asset/section")
+    p_query.add_argument("--type", type=int, help="Only this slide type")
+    p_query.add_argument("--same-type", action="store_true", help="Only the query's slide type")
+    p_query.add_argument("--per-report", type=int, help="At most this many hits per report")
+    p_query.add_argument("--include-self", action="store_true",
+                         help="Also return slides from the query's own report")
+    p_types = sub.add_parser("types", help="Slide count per type and section")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        started = time.perf_counter()
+        index, stats = build(workers=args.workers, rebuild=args.rebuild, types=args.types)
+        for f in stats["failed"]:
+            print(f"  FAILED {f['path']}: {f['error']}", file=sys.stderr)
+        print(f"{stats['images']} images ({stats['added']} added, {stats['reused']} reused, "
+              f"{stats['removed']} removed) in {time.perf_counter() - started:.1f}s")
+    else:
+        index = SimilarityIndex.load()
+        if not len(index):
+            sys.exit("Index is empty; run `python similarity.py build` first")
+        if args.cmd == "types":
+            table = {}
+            for section, t in zip(index.sections, index.types.tolist()):
+                table.setdefault(t, {}).setdefault(section, 0)
+                table[t][section] += 1
+            print(json.dumps({f"type {t}": v for t, v in sorted(table.items())}, indent=2))
+        else:
+            vector, report, own_type = query_vector(index, args.image)
+            slide_type = own_type if args.same_type else args.type
+            started = time.perf_counter()
+            hits = index.search(vector, k=args.k, section=args.section, slide_type=slide_type,
+                                exclude_report=None if args.include_self else report,
+                                per_report=args.per_report)
+            elapsed = (time.perf_counter() - started) * 1000
+            print(json.dumps({"query": args.image, "type": own_type, "ms": round(elapsed, 2),
+                              "hits": hits}, indent=2, ensure_ascii=False))
@@ -0,0 +1,164 @@
+"""
+Cycles Trading Course - Archive Integrity Verifier
+Checks every image under reports/ in a process pool: magic bytes, full decode,
+and size/SHA-256 against each report's manifest.json. Prints a JSON report on
+stdout and queues bad files in reports/redownload.json for download_report.py.
+"""
+
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+import archive
+
+# Leading bytes of the formats the site serves (webp is saved with a .png suffix)
+MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+]
+
+
+def sniff_format(head):
+    """Identify the image format from its first bytes, or None."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return None
+
+
+def check_file(args):
+    """Verify one image. Runs in a worker process, so it takes and returns plain data."""
+    path, expected = args
+    result = {"file": path, "ok": True, "errors": []}
+    try:
+        data = archive.read_bytes(path)
+    except (OSError, KeyError) as e:
+        result.update(ok=False, errors=[f"unreadable: {e}"])
+        return result
+
+    result["size"] = len(data)
+    result["sha256"] = archive.sha256_bytes(data)
+    result["format"] = sniff_format(data[:16])
+
+    if not data:
+        result["errors"].append("empty file")
+    elif result["format"] is None:
+        kind = "html page" if data.lstrip()[:1] == b"<" else "unknown format"
+        result["errors"].append(f"bad magic bytes ({kind})")
+    else:
+        try:
+            with Image.open(io.BytesIO(data)) as im:
+                im.load()
+        except Exception as e:
+            result["errors"].append(f"decode failed: {e}")
+
+    if expected:
+        if expected.get("size") != result["size"]:
+            result["errors"].append(f"size {result['size']} != manifest {expected.get('size')}")
+        if expected.get("sha256") != result["sha256"]:
+            result["errors"].append("sha256 mismatch")
+    else:
+        result["unlisted"] = True
+
+    result["ok"] = not result["errors"]
+    return result
+
+
+def collect_jobs(root=archive.REPORTS_DIR):
+    """Return [(path, manifest_entry)] for every image plus manifest entries that vanished."""
+    jobs, missing = [], []
+    for report_dir in archive.iter_reports(root):
+        files = archive.load_manifest(report_dir)["files"]
+        seen = set()
+        for path in archive.iter_images(report_dir):
+            rel = path.relative_to(report_dir).as_posix()
+            seen.add(rel)
+            jobs.append((str(path), files.get(rel)))
+        for rel in sorted(set(files) - seen):
+            missing.append(str(report_dir / rel))
+    return jobs, missing
+
+
+def verify(root=archive.REPORTS_DIR, workers=None, update_manifest=False, queue=True):
+    started = time.perf_counter()
+    jobs, missing = collect_jobs(root)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(check_file, jobs, chunksize=16))
+
+    bad = [r for r in results if not r["ok"]]
+    bad += [{"file": path, "ok": False, "errors": ["missing (listed in manifest)"]} for path in missing]
+
+    if update_manifest:
+        # Record good files that predate the manifest so later runs can detect drift
+        by_report = {}
+        for r in results:
+            if r["ok"] and r.get("unlisted"):
+                path = Path(r["file"])
+                by_report.setdefault(path.parent.parent, []).append(r)
+        for report_dir, entries in by_report.items():
+            if archive.open_bundle(report_dir):
+                continue  # packed reports are read-only; unpack to add a manifest
+            try:
+                with archive.report_lock(report_dir):
+                    manifest = archive.load_manifest(report_dir)
+                    for r in entries:
+                        rel = Path(r["file"]).relative_to(report_dir).as_posix()
+                        manifest["files"][rel] = {"size": r["size"], "sha256": r["sha256"]}
+                    archive.write_manifest(report_dir, manifest)
+            except archive.LockTimeout:
+                print(f"  Manifest {archive.report_id(report_dir, root)}: busy, skipped", file=sys.stderr)
+                continue
+            print(f"  Manifest {archive.report_id(report_dir, root)}: +{len(entries)} files", file=sys.stderr)
+
+    if queue and (bad or archive.REDOWNLOAD_QUEUE.exists()):
+        def queue_key(path):
+            path = Path(path)
+            report_dir = path.parent.parent
+            return archive.report_id(report_dir, root), path.relative_to(report_dir).as_posix()
+
+        with archive.queue_lock():
+            entries = {(e["report"], e["file"]): e for e in archive.load_redownload_queue()}
+            for r in results:
+                if r["ok"]:
+                    entries.pop(queue_key(r["file"]), None)
+            for r in bad:
+                key = queue_key(r["file"])
+                entries[key] = {"report": key[0], "file": key[1], "reasons": r["errors"]}
+            archive.save_redownload_queue(sorted(entries.values(), key=lambda e: (e["report"], e["file"])))
+
+    return {
+        "checked": len(results),
+        "ok": len(results) - len([r for r in results if not r["ok"]]),
+        "bad": [{"file": str(Path(r["file"]).relative_to(root)), "errors": r["errors"]} for r in bad],
+        "unlisted": sum(1 for r in results if r.get("unlisted")),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Verify downloaded report images")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--update-manifest", action="store_true",
+                        help="Add good files missing from manifest.json")
+    parser.add_argument("--no-queue", action="store_true",
+                        help="Don't add bad files to reports/redownload.json")
+    args = parser.parse_args()
+
+    report = verify(workers=args.workers, update_manifest=args.update_manifest,
+                    queue=not args.no_queue)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"{report['ok']}/{report['checked']} OK, {len(report['bad'])} bad "
+          f"in {report['seconds']}s", file=sys.stderr)
+    sys.exit(1 if report["bad"] else 0)
@@ -0,0 +1,197 @@
+"""
+Cycles Trading Course - New Report Watcher
+Polls the site's WordPress REST API for new or modified report posts and
+downloads them with download_report.py as soon as they are published.
+
+Polling is a single small JSON request with conditional headers; Chromium is
+only started (in a download_report.py subprocess) when a report actually changed.
+"""
+
+import html
+import http.client
+import json
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import unquote
+from urllib.request import Request, urlopen
+
+import archive
+
+HERE = Path(__file__).parent
+STATE_FILE = HERE / "watch_state.json"
+
+POSTS_URL = (
+    "https://cyclestrading-course.com/wp-json/wp/v2/posts"
+    "?per_page=20&orderby=modified&order=desc&_fields=id,link,title,modified_gmt"
+)
+
+# Title words that mark a report post (monthly, special, annual forecast)
+REPORT_WORDS = ["דוח", "תחזית"]
+
+POLL_INTERVAL = 15 * 60
+MAX_BACKOFF = 6 * 60 * 60
+JITTER = 0.1
+
+
+def load_state():
+    return archive.read_json(STATE_FILE) or {"etag": None, "last_modified": None, "posts": {}}
+
+
+def save_state(state):
+    archive.write_json(STATE_FILE, state)
+
+
+def seed_from_archive(state):
+    """Remember report URLs already in the archive so a first run doesn't re-download them."""
+    state.setdefault("known_urls", [])
+    urls = set(state["known_urls"])
+    for report_dir in archive.iter_reports():
+        meta = archive.read_json(report_dir / "metadata.json") or {}
+        if meta.get("url"):
+            urls.add(unquote(meta["url"]).rstrip("/"))
+    state["known_urls"] = sorted(urls)
+
+
+def fetch_posts(state, timeout=30):
+    """
+    Conditional GET of the latest posts.
+    Returns the post list, or None when the server answered 304 Not Modified.
+    """
+    headers = {"Accept": "application/json", "User-Agent": "gann-report-watcher"}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+
+    try:
+        with urlopen(Request(POSTS_URL, headers=headers), timeout=timeout) as resp:
+            state["etag"] = resp.headers.get("ETag")
+            state["last_modified"] = resp.headers.get("Last-Modified")
+            return json.loads(resp.read())
+    except HTTPError as e:
+        if e.code == 304:
+            return None
+        raise
+
+
+def changed_reports(state, posts):
+    """Return report posts that are new or whose modified_gmt moved since the last poll."""
+    known_urls = set(state.get("known_urls", []))
+    changed = []
+    for post in posts:
+        title = html.unescape(post.get("title", {}).get("rendered", ""))
+        if not any(word in title for word in REPORT_WORDS):
+            continue
+        pid = str(post["id"])
+        seen = state["posts"].get(pid)
+        if seen is None and unquote(post["link"]).rstrip("/") in known_urls:
+            # Downloaded before the watcher existed: remember it without a job
+            state["posts"][pid] = {"title": title, "url": post["link"], "modified": post["modified_gmt"]}
+            continue
+        if seen and seen.get("modified") == post["modified_gmt"]:
+            continue
+        changed.append({"id": pid, "title": title, "url": post["link"], "modified": post["modified_gmt"]})
+    return changed
+
+
+def process_report(post, export=False, feed=False):
+    """Download (and classify) one report, rebuild its derived files, then index it. Runs in a worker thread."""
+    print(f"[{post['id']}] Downloading: {post['title']}")
+    cmd = [sys.executable, str(HERE / "download_report.py"), "--url", post["url"]]
+    result = subprocess.run(cmd, cwd=HERE)
+    if result.returncode != 0:
+        raise RuntimeError(f"download_report.py exited with {result.returncode}")
+
+    # Refresh metadata.json and the dates files; only what the download changed re-runs
+    result = subprocess.run([sys.executable, str(HERE / "build.py")], cwd=HERE)
+    if result.returncode != 0:
+        raise RuntimeError(f"build.py exited with {result.returncode}")
+
+    if export:
+        # Index into the dashboard database; unchanged reports are skipped by hash
+        result = subprocess.run([sys.executable, str(HERE / "export_db.py")], cwd=HERE)
+        if result.returncode != 0:
+            raise RuntimeError(f"export_db.py exited with {result.returncode}")
+
+    if feed:
+        result = subprocess.run([sys.executable, str(HERE / "dashboard_feed.py")], cwd=HERE)
+        if result.returncode != 0:
+            raise RuntimeError(f"dashboard_feed.py exited with {result.returncode}")
+    return post
+
+
+def sleep_for(failures, interval):
+    """Poll interval with jitter, backing off exponentially after consecutive failures."""
+    delay = interval if failures == 0 else min(MAX_BACKOFF, interval * 2 ** failures)
+    return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+def reap(state, running, wait=False):
+    """Record finished jobs; a post is only marked seen once its job succeeded."""
+    for pid, future in list(running.items()):
+        if not (wait or future.done()):
+            continue
+        del running[pid]
+        try:
+            post = future.result()
+            post["downloaded_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            state["posts"][pid] = post
+            print(f"[{pid}] Done")
+        except Exception as e:
+            print(f"[{pid}] FAILED: {e}")
+            # Drop the validators so the next poll is a full fetch that retries this post
+            state["etag"] = state["last_modified"] = None
+        save_state(state)
+
+
+def run(interval=POLL_INTERVAL, once=False, workers=1, export=False, feed=False):
+    state = load_state()
+    seed_from_archive(state)
+    save_state(state)
+
+    running = {}  # post id -> Future; at most one job per report
+    failures = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            reap(state, running)
+
+            try:
+                posts = fetch_posts(state)
+                failures = 0
+            # OSError covers URLError, timeouts and dropped connections; HTTPException
+            # covers truncated or garbled responses, which urllib doesn't wrap
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                failures += 1
+                posts = None
+                print(f"Poll failed ({failures}x): {e}")
+
+            if posts is not None:
+                for post in changed_reports(state, posts):
+                    if post["id"] not in running:
+                        running[post["id"]] = pool.submit(process_report, post, export, feed)
+                save_state(state)
+
+            if once:
+                reap(state, running, wait=True)
+                return
+
+            time.sleep(sleep_for(failures, interval))
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Watch for and download new Cycles Trading reports")
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL, help="Seconds between polls")
+    parser.add_argument("--once", action="store_true", help="Poll once, run any jobs, and exit (for cron)")
+    parser.add_argument("--workers", type=int, default=1, help="Reports downloaded in parallel")
+    parser.add_argument("--export", action="store_true", help="Run export_db.py after each download")
+    parser.add_argument("--feed", action="store_true", help="Rebuild the dashboard feed after each download")
+    args = parser.parse_args()
+
+    run(interval=args.interval, once=args.once, workers=args.workers, export=args.export, feed=args.feed)
@@ -0,0 +1,212 @@
+"""
+Cycles Trading Course - TradingView Webhook Receiver
+asyncio HTTP service that annotates each TradingView alert with the report
+calendar: whether the alert's date falls in a key-date or statistics window
+for that asset.
+
+The date index is built once from the archived analysis.json files into a
+dict keyed by (asset, day), so each lookup is a single dict access, and it is
+rebuilt in the background whenever an analysis.json is added or changed.
+"""
+
+import asyncio
+import json
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, urlsplit
+
+import archive
+
+PORT = 8080
+
+# Key dates are turning *windows*: an alert this many days either side still counts
+KEY_DATE_TOLERANCE = 1
+RELOAD_INTERVAL = 5.0
+MAX_BODY = 64 * 1024
+# Epoch values below this are seconds, above it milliseconds (1e11 s is the year 5138)
+EPOCH_MS_THRESHOLD = 10 ** 11
+
+# TradingView tickers (with or without exchange prefix) to report asset keys
+TICKER_ASSETS = {
+    "SPX": "sp500", "SPX500": "sp500", "US500": "sp500", "SPY": "sp500", "ES1!": "sp500",
+    "ES": "sp500", "MES1!": "sp500", "SP500": "sp500",
+    "BTCUSD": "bitcoin", "BTCUSDT": "bitcoin", "BTC": "bitcoin", "BTC1!": "bitcoin",
+    "EURUSD": "eurusd", "6E1!": "eurusd", "EUR/USD": "eurusd",
+    "XAUUSD": "gold", "GOLD": "gold", "GC1!": "gold", "MGC1!": "gold",
+    "USOIL": "oil", "WTI": "oil", "CL1!": "oil", "MCL1!": "oil", "UKOIL": "oil", "OIL": "oil",
+}
+
+
+def ticker_to_asset(ticker):
+    ticker = str(ticker if ticker is not None else "").upper().split(":")[-1].strip()
+    return TICKER_ASSETS.get(ticker) or (ticker.lower() if ticker.lower() in archive.ASSETS else None)
+
+
+def build_index(root=archive.REPORTS_DIR, tolerance=KEY_DATE_TOLERANCE):
+    """
+    Expand every key date (+/- tolerance) and statistics window to individual
+    days: {(asset, date.toordinal()): [match, ...]}.
+    """
+    index = {}
+    for report_dir in archive.iter_reports(root):
+        rid = archive.report_id(report_dir, root)
+        for asset in archive.report_assets(report_dir):
+            analysis = archive.load_analysis(report_dir, asset)
+            for kd in archive.key_dates(analysis):
+                match = {"type": "key_date", "report": rid, "start": kd["start"].isoformat(),
+                         "end": kd["end"].isoformat(), "description": kd["description"]}
+                first = kd["start"].toordinal() - tolerance
+                last = kd["end"].toordinal() + tolerance
+                for day in range(first, last + 1):
+                    index.setdefault((asset, day), []).append(match)
+            for st in archive.statistics(analysis):
+                match = {"type": "statistic", "report": rid, "start": st["start"].isoformat(),
+                         "end": st["end"].isoformat(), "direction": st["direction"],
+                         "probability": st["probability"], "description": st["description"]}
+                for day in range(st["start"].toordinal(), st["end"].toordinal() + 1):
+                    index.setdefault((asset, day), []).append(match)
+    return index
+
+
+def parse_alert_time(value):
+    """Parse TradingView's {{time}}/{{timenow}} (ISO 8601) or epoch s/ms; default to now."""
+    if value is None or value == "":
+        return datetime.now(timezone.utc).date()
+    if isinstance(value, (int, float)) or str(value).isdigit():
+        seconds = float(value)
+        if seconds >= EPOCH_MS_THRESHOLD:
+            seconds /= 1000
+        return datetime.fromtimestamp(seconds, timezone.utc).date()
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).date()
+
+
+class Receiver:
+    def __init__(self, root=archive.REPORTS_DIR, tolerance=KEY_DATE_TOLERANCE, log=True):
+        self.root = root
+        self.tolerance = tolerance
+        self.log = log
+        self.mtimes = archive.archive_signature(root)
+        self.index = build_index(root, tolerance)
+        self.alerts = 0
+
+    async def watch(self):
+        """Rebuild the index off the event loop when analysis.json files change."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                mtimes = await loop.run_in_executor(None, archive.archive_signature, self.root)
+                if mtimes == self.mtimes:
+                    continue
+                index = await loop.run_in_executor(None, build_index, self.root, self.tolerance)
+            except Exception as e:
+                # A half-written or just-removed analysis.json: keep serving the old index, retry next tick
+                print(f"Reload failed, keeping the previous index: {e}")
+                continue
+            self.index, self.mtimes = index, mtimes  # single reference swap
+            print(f"Reloaded date index: {len(mtimes)} files, {len(index)} asset-days")
+
+    def annotate(self, alert, query):
+        """Return the calendar annotation for one alert (dict from JSON body or query)."""
+        ticker = alert.get("ticker") or alert.get("symbol") or query.get("ticker") or query.get("asset")
+        asset = ticker_to_asset(ticker)
+        day = parse_alert_time(alert.get("time") or alert.get("timenow") or query.get("date"))
+        matches = self.index.get((asset, day.toordinal()), []) if asset else []
+        return {
+            "ok": True,
+            "ticker": ticker,
+            "asset": asset,
+            "date": day.isoformat(),
+            "key_date": any(m["type"] == "key_date" for m in matches),
+            "statistic": any(m["type"] == "statistic" for m in matches),
+            "matches": matches,
+        }
+
+    async def handle(self, reader, writer):
+        """Minimal HTTP/1.1 keep-alive loop: POST/GET any path -> JSON annotation."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, version = (lines[0].split(" ") + ["", "", ""])[:3]
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    if name:
+                        headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    # Can't tell where the body ends, so the connection can't be reused
+                    await self.respond(writer, 400, {"ok": False, "error": "bad Content-Length"}, close=True)
+                    return
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {"ok": False, "error": "body too large"}, close=True)
+                    return
+                body = await reader.readexactly(length) if length else b""
+
+                url = urlsplit(target)
+                query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                status, payload = 200, None
+                if url.path == "/health":
+                    payload = {"ok": True, "alerts": self.alerts, "asset_days": len(self.index)}
+                else:
+                    try:
+                        alert = json.loads(body) if body.strip().startswith(b"{") else {}
+                        payload = self.annotate(alert, query)
+                        self.alerts += 1
+                    except Exception as e:
+                        # Any malformed alert is the client's error, not a dropped connection
+                        status, payload = 400, {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+                if self.log and url.path != "/health":
+                    print(f"{method} {url.path} {payload.get('asset')} {payload.get('date')} "
+                          f"key_date={payload.get('key_date')} statistic={payload.get('statistic')}")
+
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                await self.respond(writer, status, payload, close=close)
+                if close:
+                    return
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, close=False):
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+        reason = {200: "OK", 400: "Bad Request", 413: "Payload Too Large"}[status]
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'close' if close else 'keep-alive'}\r\n\r\n"
+            .encode() + body
+        )
+        await writer.drain()
+
+
+async def serve(host, port, tolerance, log):
+    receiver = Receiver(tolerance=tolerance, log=log)
+    server = await asyncio.start_server(receiver.handle, host, port, backlog=1024)
+    print(f"Webhook receiver listening on http://{host}:{port} "
+          f"({len(receiver.mtimes)} files, {len(receiver.index)} asset-days)")
+    async with server:
+        watcher = asyncio.create_task(receiver.watch())
+        try:
+            await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Annotate TradingView alerts with report dates")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--tolerance", type=int, default=KEY_DATE_TOLERANCE,
+                        help="Days either side of a key date that still count")
+    parser.add_argument("--quiet", action="store_true", help="Don't log each alert")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, args.tolerance, not args.quiet))